@@ -1,4 +1,3 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
@@ -8,6 +7,10 @@ import traceback
 import tkinter as tk
 from tkinter import ttk, messagebox
 import argparse
+from market_data.providers import get_default_provider
+from market_data.store import normalize_ohlcv
+from strategies import indicators, kernels, metrics
+from strategies.trade_table import TradeTable
 warnings.filterwarnings('ignore')
 
 class ATRStrategy:
@@ -48,13 +51,13 @@ class ATRStrategy:
     def download_data(self):
         """下載股票數據"""
         print(f"開始下載 {self.ticker} 數據...")
-        self.df = yf.download(self.ticker, period="1mo", start=self.start_date, end=self.end_date, progress=False, threads=False)
-        if self.df.empty:
+        # 資料來源預設為 yfinance，可用環境變數 ATR_DATA_PROVIDER 改為 synthetic 等離線來源
+        self.df = get_default_provider().fetch(self.ticker, self.start_date, self.end_date)
+        if self.df is None or self.df.empty:
             raise ValueError("No data downloaded")
             
-        # 修正 MultiIndex 欄位
-        if isinstance(self.df.columns, pd.MultiIndex):
-            self.df.columns = self.df.columns.get_level_values(0)
+        # 修正 MultiIndex 欄位並統一欄位型別
+        self.df = normalize_ohlcv(self.df)
             
         print("數據下載完成")
         return self.df
@@ -64,20 +67,17 @@ class ATRStrategy:
         if self.df is None:
             raise ValueError("請先下載數據")
             
-        df = self.df.copy()
+        # 指標欄位直接加在自己持有的資料上（新增欄位不會複製既有欄位）
+        df = self.df
         
-        # 計算 True Range
-        df['H-L'] = df['High'] - df['Low']
-        df['H-PC'] = abs(df['High'] - df['Close'].shift(1))
-        df['L-PC'] = abs(df['Low'] - df['Close'].shift(1))
-        
-        # 使用 numpy 的 maximum 函數來計算 TR
-        df['TR'] = np.maximum(df['H-L'], np.maximum(df['H-PC'], df['L-PC']))
+        # 計算 True Range（與 strategies 套件共用同一份實作）；沿用舊版語意，
+        # 第一根K棒沒有前收盤價時 TR 為 NaN，EMA 由第二根開始，ATR 與交易結果與舊版相同
+        tr = indicators.true_range(self.df)
+        df['TR'] = tr.where(np.arange(len(tr)) > 0)
         
         # 使用 EMA 而不是簡單移動平均
         df['ATR'] = df['TR'].ewm(span=self.atr_period, adjust=False).mean()
         
-        self.df = df
         return df
     
     def calculate_signals(self):
@@ -85,7 +85,7 @@ class ATRStrategy:
         if self.df is None:
             raise ValueError("請先計算 ATR")
             
-        df = self.df.copy()
+        df = self.df
         
         # 計算移動平均
         df['20D_High'] = df['High'].rolling(window=self.high_period).max()
@@ -101,7 +101,7 @@ class ATRStrategy:
         
         # 使用 numpy 的 where 函數來計算信號
         close_price = df['Close'].values
-        high_20d = df['20D_High'].shift(1).fillna(method='bfill').values
+        high_20d = df['20D_High'].shift(1).bfill().values
         atr = df['ATR'].values
         atr_mean = df['ATR_Mean'].values
         
@@ -111,7 +111,6 @@ class ATRStrategy:
         
         df['Signal'] = np.where(signal_condition, 1, 0)
         
-        self.df = df
         return df
     
     def backtest(self):
@@ -119,81 +118,26 @@ class ATRStrategy:
         if self.df is None:
             raise ValueError("請先計算信號")
             
-        df = self.df.copy()
-        
-        entry_price = 0
-        stop_loss = 0
-        take_profit = 0
-        position = 0
-        entry_date = None
-        returns = []
-        trades = []
-        
-        for i in range(1, len(df)):
-            current_date = df.index[i]
-            
-            # 進場邏輯
-            if df['Signal'].iloc[i] == 1 and position == 0:
-                entry_price = df['Close'].iloc[i]
-                stop_loss = entry_price - self.atr_multiplier * df['ATR'].iloc[i]
-                take_profit = entry_price + self.profit_multiplier * df['ATR'].iloc[i]
-                position = 1
-                entry_date = current_date
-                trades.append({
-                    'entry_date': entry_date,
-                    'entry_price': entry_price,
-                    'stop_loss': stop_loss,
-                    'take_profit': take_profit
-                })
-            
-            # 出場邏輯
-            elif position == 1:
-                current_price = df['Close'].iloc[i]
-                hold_days = (current_date - entry_date).days
-                
-                # 止損
-                if current_price < stop_loss:
-                    returns.append((current_price - entry_price) / entry_price)
-                    position = 0
-                    trades[-1].update({
-                        'exit_date': current_date,
-                        'exit_price': current_price,
-                        'return': returns[-1],
-                        'exit_reason': 'stop_loss'
-                    })
-                
-                # 獲利了結
-                elif current_price > take_profit:
-                    returns.append((current_price - entry_price) / entry_price)
-                    position = 0
-                    trades[-1].update({
-                        'exit_date': current_date,
-                        'exit_price': current_price,
-                        'return': returns[-1],
-                        'exit_reason': 'take_profit'
-                    })
-                
-                # 時間止損
-                elif hold_days >= self.max_hold_days:
-                    returns.append((current_price - entry_price) / entry_price)
-                    position = 0
-                    trades[-1].update({
-                        'exit_date': current_date,
-                        'exit_price': current_price,
-                        'return': returns[-1],
-                        'exit_reason': 'time_stop'
-                    })
-                
-                # 最後一個交易日強制平倉
-                elif i == len(df) - 1:
-                    returns.append((current_price - entry_price) / entry_price)
-                    position = 0
-                    trades[-1].update({
-                        'exit_date': current_date,
-                        'exit_price': current_price,
-                        'return': returns[-1],
-                        'exit_reason': 'force_close'
-                    })
+        df = self.df
+        close = df['Close'].values
+        atr = df['ATR'].values
+        stop_levels = close - self.atr_multiplier * atr
+        profit_levels = close + self.profit_multiplier * atr
+        
+        # 止損、獲利了結、時間止損與最後一根強制平倉由陣列化的出場引擎計算（從第二根K棒開始）
+        entry_idx, exit_idx, reasons = kernels.exit_trades(
+            df['Signal'].values, close,
+            times=indicators.time_index(df),
+            stop_loss=stop_levels,
+            take_profit=profit_levels,
+            max_hold=self.max_hold_days * indicators.NS_PER_DAY,
+            start=1
+        )
+        
+        # 最後一根K棒才進場的交易維持未平倉（沒有報酬）
+        trades = TradeTable.from_arrays(df.index, close, entry_idx, exit_idx, reasons,
+                                        stop_loss=stop_levels, take_profit=profit_levels)
+        returns = trades.returns
         
         self.returns = returns
         self.trades = trades
@@ -255,27 +199,30 @@ class ATRStrategy:
             
         returns_series = pd.Series(self.returns)
         total_return = (1 + returns_series).prod() - 1
-        win_rate = len([r for r in self.returns if r > 0]) / len(self.returns)
+        win_rate = np.count_nonzero(self.returns > 0) / len(self.returns)
         avg_return = np.mean(self.returns)
-        max_drawdown = min(self.returns)
-        sharpe_ratio = np.sqrt(252) * returns_series.mean() / returns_series.std()
+        # 最大回撤與夏普比率以持倉期間的每日權益曲線計算
+        daily = metrics.trade_metrics(self.df['Close'], self.trades)
         
         # 計算不同出場原因的統計
+        reasons = self.trades.reason_names('unknown')
+        trade_returns = np.nan_to_num(self.trades['return'])
         exit_reasons = {}
-        for trade in self.trades:
-            reason = trade.get('exit_reason', 'unknown')
-            if reason not in exit_reasons:
-                exit_reasons[reason] = {'count': 0, 'returns': []}
-            exit_reasons[reason]['count'] += 1
-            exit_reasons[reason]['returns'].append(trade.get('return', 0))
+        for reason in pd.unique(reasons):
+            mask = reasons == reason
+            exit_reasons[reason] = {'count': int(mask.sum()), 'returns': trade_returns[mask].tolist()}
         
         stats = {
             'total_return': total_return,
             'num_trades': len(self.returns),
             'win_rate': win_rate,
             'avg_return': avg_return,
-            'max_drawdown': max_drawdown,
-            'sharpe_ratio': sharpe_ratio,
+            'max_drawdown': daily['max_drawdown'],
+            'max_drawdown_duration': daily['max_drawdown_duration'],
+            'sharpe_ratio': daily['sharpe_ratio'],
+            'sortino_ratio': daily['sortino_ratio'],
+            'calmar_ratio': daily['calmar_ratio'],
+            'exposure': daily['exposure'],
             'exit_reasons': exit_reasons
         }
         
@@ -311,8 +258,11 @@ class ATRStrategy:
             print(f"交易次數：{stats['num_trades']}")
             print(f"勝率：{stats['win_rate']:.2%}")
             print(f"平均報酬：{stats['avg_return']:.2%}")
-            print(f"最大回撤：{stats['max_drawdown']:.2%}")
+            print(f"最大回撤：{stats['max_drawdown']:.2%}（{stats['max_drawdown_duration']} 根K棒）")
             print(f"夏普比率：{stats['sharpe_ratio']:.2f}")
+            print(f"索提諾比率：{stats['sortino_ratio']:.2f}")
+            print(f"卡瑪比率：{stats['calmar_ratio']:.2f}")
+            print(f"曝險比例：{stats['exposure']:.2%}")
             
             print(f"\n=== 出場原因統計 ===")
             for reason, reason_stats in stats['exit_reasons'].items():
@@ -0,0 +1,8 @@
+from .grid_search import expand_grid, evaluate, evaluate_grid, grid_search, resolve_strategy, run_combos, METRICS
+from .walk_forward import make_folds, position_returns, walk_forward
+from .halving import successive_halving
+from .robustness import block_bootstrap, bootstrap_trades, path_metrics, robustness, summarize
+
+__all__ = ['expand_grid', 'evaluate', 'evaluate_grid', 'grid_search', 'resolve_strategy', 'run_combos', 'METRICS',
+           'make_folds', 'position_returns', 'walk_forward', 'successive_halving',
+           'block_bootstrap', 'bootstrap_trades', 'path_metrics', 'robustness', 'summarize']
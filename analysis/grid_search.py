@@ -0,0 +1,137 @@
+"""
+參數網格搜尋：資料只載入一次，放進共享記憶體後由多個 worker 行程平行回測各組參數
+"""
+import contextlib
+import io
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from market_data.shared_arrays import SharedOHLCV, attach_frame
+from strategies import STRATEGIES, BaseStrategy, jit
+
+# 每組參數輸出的績效欄位
+METRICS = ('total_return', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'max_drawdown', 'win_rate',
+           'num_trades')
+
+
+def resolve_strategy(strategy):
+    """接受策略類別或名稱（atr、ma、rsi、supertrend），回傳策略類別"""
+    if isinstance(strategy, type) and issubclass(strategy, BaseStrategy):
+        return strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知的策略: {strategy}，可用: {', '.join(STRATEGIES)}")
+    return STRATEGIES[strategy]
+
+
+def expand_grid(grid: dict) -> list:
+    """將 {參數: [候選值, ...]} 展開為所有組合（依參數順序的笛卡兒積）"""
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple, np.ndarray, range)) else [v] for v in grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def evaluate(strategy_class, data: pd.DataFrame, params: dict) -> dict:
+    """以指定參數回測一次並取出績效欄位，參數不合法或回測失敗時績效為 NaN"""
+    try:
+        strategy = strategy_class(data=data, **params)
+        # 部分策略回測時會印出交易明細，大量回測時略過
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = strategy.backtest()
+        # 未提供的指標（例如自訂策略沒有每日績效）為 NaN
+        return {name: results.get(name, np.nan) for name in METRICS}
+    except Exception as e:
+        print(f"參數 {params} 回測失敗: {str(e)}")
+        return {name: np.nan for name in METRICS}
+
+
+def prime(strategy_class, data: pd.DataFrame, combos: list):
+    """
+    以批次函式一次算出多組參數所需的指標；含不合法參數而整批失敗時改為逐組預先計算，
+    不合法的組合留給 evaluate() 記為 NaN，不中斷整個搜尋
+    """
+    try:
+        strategy_class.prime_indicators(data, combos)
+    except Exception:
+        for params in combos:
+            try:
+                strategy_class.prime_indicators(data, [params])
+            except Exception:
+                pass
+
+
+def evaluate_grid(strategy_class, data: pd.DataFrame, combos: list) -> list:
+    """在目前行程依序回測多組參數（先以批次函式一次算出所需的指標視窗），回傳每組的績效欄位"""
+    prime(strategy_class, data, combos)
+    return [evaluate(strategy_class, data, params) for params in combos]
+
+
+# worker 行程共用的資料（由 initializer 由共享記憶體取得，每個行程只 attach 一次）
+_worker_data = None
+
+
+def _init_worker(handle: dict):
+    global _worker_data
+    _worker_data = attach_frame(handle)
+    jit.warmup()
+
+
+def _run_chunk(strategy_class, chunk: list) -> list:
+    return evaluate_grid(strategy_class, _worker_data, chunk)
+
+
+def run_combos(strategy_class, data: pd.DataFrame, combos: list, max_workers: int = None,
+               chunk_size: int = None) -> list:
+    """
+    平行回測多組參數，回傳與 combos 同順序的績效欄位
+    max_workers 為 1（或只有一組參數）時在目前行程執行，否則資料放進共享記憶體由行程池分批處理
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = min(max_workers, len(combos)) or 1
+    if max_workers == 1:
+        return evaluate_grid(strategy_class, data, combos)
+
+    chunk_size = chunk_size or max(1, math.ceil(len(combos) / (max_workers * 4)))
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+    shared = SharedOHLCV.create(data)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared.handle,)) as executor:
+            results = executor.map(_run_chunk, itertools.repeat(strategy_class), chunks)
+            return [row for chunk in results for row in chunk]
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def grid_search(strategy, grid: dict, data: pd.DataFrame = None, ticker: str = None,
+                start_date: str = None, base_params: dict = None, max_workers: int = None,
+                chunk_size: int = None) -> pd.DataFrame:
+    """
+    平行回測參數網格
+    Args:
+        strategy: 策略類別或名稱
+        grid: {參數: [候選值, ...]}
+        data: 已載入的 OHLCV；未提供時依 ticker、start_date 載入一次（走一般的快取流程）
+        base_params: 不在網格內的固定參數
+        max_workers: worker 行程數，預設為 CPU 核心數；1 表示在目前行程執行
+        chunk_size: 每次派送給 worker 的組合數，預設約為每個 worker 四批
+    Returns:
+        每組參數一列的結果表：參數欄位加上 METRICS
+    """
+    strategy_class = resolve_strategy(strategy)
+    if data is None:
+        data = strategy_class(ticker, start_date).data
+    if data is None or data.empty:
+        raise ValueError("沒有數據可供回測")
+
+    combos = [{**(base_params or {}), **params} for params in expand_grid(grid)]
+    rows = run_combos(strategy_class, data, combos, max_workers, chunk_size)
+
+    # 搜尋的參數放在前面，固定參數在後
+    columns = list(grid) + [name for name in (base_params or {}) if name not in grid]
+    params = pd.DataFrame(combos, columns=columns)
+    metrics = pd.DataFrame(rows, columns=list(METRICS))
+    return pd.concat([params, metrics], axis=1)
@@ -0,0 +1,124 @@
+"""
+連續減半（successive halving）參數最佳化：先以最近一小段歷史評估大量候選參數，
+每一輪只保留前 1/eta 的候選並把歷史長度放大 eta 倍，直到以完整歷史評估剩下的候選
+"""
+import math
+import time
+import numpy as np
+import pandas as pd
+from .grid_search import METRICS, expand_grid, resolve_strategy, run_combos
+
+
+def _rank(rows: list, metric: str, min_trades: int) -> np.ndarray:
+    """依績效由佳到差排序的位置；NaN 或交易次數不足者排在最後"""
+    scores = np.array([row[metric] for row in rows], dtype='float64')
+    if metric == 'max_drawdown':
+        scores = -scores
+    trades = np.array([row['num_trades'] for row in rows], dtype='float64')
+    scores[np.isnan(scores) | ~(trades >= min_trades)] = -np.inf
+    # 穩定排序：同分時保留候選的原始順序
+    return np.argsort(-scores, kind='stable')
+
+
+def successive_halving(strategy, grid: dict = None, candidates: list = None, data: pd.DataFrame = None,
+                       ticker: str = None, start_date: str = None, n_candidates: int = None,
+                       eta: int = 3, min_bars: int = 126, metric: str = 'sharpe_ratio',
+                       min_trades: int = 1, base_params: dict = None, seed: int = None,
+                       max_workers: int = None) -> dict:
+    """
+    以連續減半搜尋參數
+    Args:
+        strategy: 策略類別或名稱（任何 BaseStrategy 子類別，參數名稱以 get_parameters() 檢查）
+        grid: {參數: [候選值, ...]}，展開為候選參數
+        candidates: 直接指定的候選參數清單（與 grid 擇一）
+        n_candidates: 由網格中隨機抽出的候選數，預設使用全部組合
+        eta: 每輪保留 1/eta 的候選，並將歷史長度放大 eta 倍
+        min_bars: 第一輪使用的最少 K 棒數（取最近的一段歷史）
+        metric: 排名依據（METRICS 之一，max_drawdown 取最小）
+        min_trades: 交易次數不足者排在最後
+        seed: 抽樣候選的亂數種子
+    Returns:
+        {
+            'best': 最佳參數（get_parameters() 的完整參數）,
+            'results': 最後一輪的結果表（由佳到差）,
+            'history': 所有輪次的評估紀錄,
+            'rungs': 每輪的歷史長度、候選數與花費,
+            'cost': 總花費與完整網格（全部候選 × 完整歷史）的比較
+        }
+    """
+    if metric not in METRICS:
+        raise ValueError(f"未知的績效指標: {metric}，可用: {', '.join(METRICS)}")
+    if eta < 2:
+        raise ValueError("eta 必須至少為 2")
+    strategy_class = resolve_strategy(strategy)
+    if data is None:
+        data = strategy_class(ticker, start_date).data
+    if data is None or data.empty:
+        raise ValueError("沒有數據可供回測")
+
+    if candidates is None:
+        if grid is None:
+            raise ValueError("需要提供 grid 或 candidates")
+        candidates = expand_grid(grid)
+        if n_candidates is not None and n_candidates < len(candidates):
+            rng = np.random.default_rng(seed)
+            chosen = np.sort(rng.choice(len(candidates), size=n_candidates, replace=False))
+            candidates = [candidates[i] for i in chosen]
+    if not candidates:
+        raise ValueError("沒有候選參數")
+
+    # 以策略的 get_parameters() 取得參數名稱，檢查候選參數並補齊預設值
+    defaults = strategy_class(data=data).get_parameters()
+    candidates = [{**(base_params or {}), **params} for params in candidates]
+    unknown = sorted({name for params in candidates for name in params if name not in defaults})
+    if unknown:
+        raise ValueError(f"{strategy_class.__name__} 沒有參數: {', '.join(unknown)}")
+    candidates = [strategy_class(data=data, **params).get_parameters() for params in candidates]
+
+    n_bars = len(data)
+    n_rungs = max(1, math.floor(math.log(max(n_bars / min_bars, 1), eta)) + 1)
+    survivors = list(range(len(candidates)))
+    history, rungs = [], []
+    started = time.perf_counter()
+
+    for rung in range(n_rungs):
+        # 最後一輪使用完整歷史，之前每輪少 eta 倍（取最近的一段）
+        bars = n_bars if rung == n_rungs - 1 else max(min_bars, n_bars // eta ** (n_rungs - 1 - rung))
+        window = data.iloc[n_bars - bars:]
+        rung_started = time.perf_counter()
+        rows = run_combos(strategy_class, window, [candidates[i] for i in survivors], max_workers)
+        order = _rank(rows, metric, min_trades)
+
+        for position, k in enumerate(order):
+            history.append({'rung': rung, 'bars': bars, 'rank': position + 1,
+                            **candidates[survivors[k]], **rows[k]})
+        kept = len(survivors) if rung == n_rungs - 1 else max(1, math.ceil(len(survivors) / eta))
+        rungs.append({
+            'rung': rung,
+            'bars': bars,
+            'start': window.index[0],
+            'candidates': len(survivors),
+            'kept': kept,
+            'bar_evaluations': len(survivors) * bars,
+            'seconds': time.perf_counter() - rung_started,
+        })
+        survivors = [survivors[k] for k in order[:kept]]
+
+    history = pd.DataFrame(history)
+    rungs = pd.DataFrame(rungs)
+    results = history[history['rung'] == n_rungs - 1].drop(columns=['rung']).reset_index(drop=True)
+    full_cost = len(candidates) * n_bars
+    spent = int(rungs['bar_evaluations'].sum())
+    return {
+        'best': candidates[survivors[0]],
+        'results': results,
+        'history': history,
+        'rungs': rungs,
+        'cost': {
+            'backtests': int(rungs['candidates'].sum()),
+            'bar_evaluations': spent,
+            'full_grid_bar_evaluations': full_cost,
+            'fraction_of_full_grid': spent / full_cost,
+            'seconds': time.perf_counter() - started,
+        },
+    }
@@ -0,0 +1,174 @@
+"""
+蒙地卡羅 / bootstrap 穩健性分析：重抽交易報酬與以區塊重抽每日報酬，
+以二維 numpy 陣列一次產生所有路徑，估計總報酬率、最大回撤與夏普比率的分布與信賴區間
+"""
+import math
+import numpy as np
+import pandas as pd
+from strategies import metrics
+from strategies.metrics import PERIODS_PER_YEAR, RISK_FREE_RATE, position_returns
+from strategies.trade_table import trade_returns
+
+# 每批路徑的元素上限（路徑數 × 長度），控制記憶體用量
+_MAX_BATCH_ELEMENTS = 4_000_000
+
+# 每條路徑輸出的績效指標
+PATH_METRICS = ('total_return', 'max_drawdown', 'sharpe_ratio')
+
+
+def path_metrics(paths: np.ndarray, risk_free_rate: float = RISK_FREE_RATE) -> dict:
+    """
+    每條報酬路徑（每列一條）的總報酬率、最大回撤與夏普比率，由 metrics.compute 計算
+    （回撤含起始資金 1，年化設定同 metrics.PERIODS_PER_YEAR）
+    """
+    paths = np.atleast_2d(np.asarray(paths, dtype='float64'))
+    result = metrics.compute(paths, risk_free_rate=risk_free_rate)
+    return {name: result[name] for name in PATH_METRICS}
+
+
+def _simulate(draw, n_paths: int, length: int, seed) -> pd.DataFrame:
+    """分批產生路徑並計算績效，draw(rng, 路徑數) 回傳 (路徑數, length) 的報酬陣列"""
+    rng = np.random.default_rng(seed)
+    batch = max(1, _MAX_BATCH_ELEMENTS // max(length, 1))
+    results = {name: [] for name in PATH_METRICS}
+    for start in range(0, n_paths, batch):
+        for name, values in path_metrics(draw(rng, min(batch, n_paths - start))).items():
+            results[name].append(values)
+    return pd.DataFrame({name: np.concatenate(values) for name, values in results.items()})
+
+
+def bootstrap_trades(returns, n_paths: int = 10000, seed: int = None) -> pd.DataFrame:
+    """
+    交易報酬的 bootstrap：每條路徑自原始交易中重複抽出相同筆數（取後放回）
+    Returns:
+        每條路徑一列的 total_return、max_drawdown、sharpe_ratio
+    """
+    returns = np.asarray(returns, dtype='float64')
+    if len(returns) == 0:
+        raise ValueError("沒有交易報酬可供重抽")
+    return _simulate(lambda rng, size: returns[rng.integers(0, len(returns), (size, len(returns)))],
+                     n_paths, len(returns), seed)
+
+
+def _block_tables(daily_returns: np.ndarray, length: int, risk_free_rate: float) -> tuple:
+    """
+    以每個位置為起點（循環）、長度 length 的區塊摘要：
+    對數成長、區塊內累積對數成長的最高與最低點、區塊內的最大對數回撤、超額報酬的一次與二次和
+    """
+    n = len(daily_returns)
+    log_growth = np.log1p(daily_returns)
+    excess = daily_returns - risk_free_rate / PERIODS_PER_YEAR
+    cumulative = np.zeros(n)
+    peak = np.full(n, -np.inf)
+    low = np.full(n, np.inf)
+    inner = np.zeros(n)
+    sum1 = np.zeros(n)
+    sum2 = np.zeros(n)
+    positions = np.arange(n)
+    for k in range(length):
+        index = (positions + k) % n
+        cumulative = cumulative + log_growth[index]
+        peak = np.maximum(peak, cumulative)
+        low = np.minimum(low, cumulative)
+        inner = np.maximum(inner, peak - cumulative)
+        sum1 += excess[index]
+        sum2 += excess[index] ** 2
+    return cumulative, peak, low, inner, sum1, sum2
+
+
+def block_bootstrap(daily_returns, n_paths: int = 10000, block_size: int = 20, seed: int = None,
+                    risk_free_rate: float = RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    每日報酬的循環區塊 bootstrap：以長度 block_size 的連續區塊重組，保留短期自我相關
+    每個可能的區塊先算好摘要（成長、區塊內高低點與回撤、報酬的一次與二次和），
+    每條路徑只需依序合併抽到的區塊，不必展開成 (路徑數, 天數) 的陣列；結果與逐日計算相同
+    Returns:
+        每條路徑一列的 total_return、max_drawdown、sharpe_ratio
+    """
+    daily_returns = np.asarray(daily_returns, dtype='float64')
+    n = len(daily_returns)
+    if n == 0:
+        raise ValueError("沒有每日報酬可供重抽")
+    block_size = max(1, min(int(block_size), n))
+    n_blocks = math.ceil(n / block_size)
+    full = _block_tables(daily_returns, block_size, risk_free_rate)
+    last_length = n - (n_blocks - 1) * block_size
+    last = full if last_length == block_size else _block_tables(daily_returns, last_length, risk_free_rate)
+
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, n, (n_paths, n_blocks))
+    log_equity = np.zeros(n_paths)
+    # 最高點從起始資金（對數 0）算起，與 metrics.compute 的回撤定義一致
+    log_peak = np.zeros(n_paths)
+    log_drawdown = np.zeros(n_paths)
+    sum1 = np.zeros(n_paths)
+    sum2 = np.zeros(n_paths)
+    for j in range(n_blocks):
+        growth, peak, low, inner, block_sum1, block_sum2 = full if j < n_blocks - 1 else last
+        s = starts[:, j]
+        # 區塊內的最低點相對於之前的最高點，或區塊內自身的回撤
+        log_drawdown = np.maximum(log_drawdown, np.maximum(log_peak - log_equity - low[s], inner[s]))
+        log_peak = np.maximum(log_peak, log_equity + peak[s])
+        log_equity = log_equity + growth[s]
+        sum1 += block_sum1[s]
+        sum2 += block_sum2[s]
+
+    mean = sum1 / n
+    std = np.sqrt(np.maximum(sum2 / n - mean ** 2, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * math.sqrt(PERIODS_PER_YEAR), 0.0)
+    if n < 2:
+        sharpe = np.zeros(n_paths)
+    return pd.DataFrame({
+        'total_return': np.expm1(log_equity),
+        'max_drawdown': -np.expm1(-log_drawdown),
+        'sharpe_ratio': sharpe,
+    })
+
+
+def summarize(distribution: pd.DataFrame, observed: dict = None, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    各績效指標的分布摘要與信賴區間
+    Returns:
+        每個指標一列：observed（原始順序）、mean、std、lower、median、upper
+    """
+    alpha = (1 - confidence) / 2
+    rows = {}
+    for name in distribution.columns:
+        values = distribution[name].to_numpy()
+        lower, median, upper = np.quantile(values, [alpha, 0.5, 1 - alpha])
+        rows[name] = {
+            'observed': (observed or {}).get(name, np.nan),
+            'mean': values.mean(),
+            'std': values.std(),
+            'lower': lower,
+            'median': median,
+            'upper': upper,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def robustness(results: dict, data: pd.DataFrame = None, n_paths: int = 10000, block_size: int = 20,
+               confidence: float = 0.95, seed: int = None) -> dict:
+    """
+    對一次回測結果做穩健性分析
+    Args:
+        results: backtest() 的回傳值（使用其中的 trades）
+        data: 回測使用的 OHLCV；提供時另外以區塊 bootstrap 重抽持倉期間的每日報酬
+    Returns:
+        {'trades': {'distribution', 'summary'}, 'daily': {'distribution', 'summary'}（有 data 時）}
+    """
+    returns = trade_returns(results['trades'])
+    analysis = {}
+    if len(returns):
+        distribution = bootstrap_trades(returns, n_paths, seed)
+        observed = {name: float(values[0]) for name, values in path_metrics(returns).items()}
+        analysis['trades'] = {'distribution': distribution,
+                              'summary': summarize(distribution, observed, confidence)}
+    if data is not None:
+        daily = position_returns(data['Close'], results['trades']).to_numpy()
+        distribution = block_bootstrap(daily, n_paths, block_size, seed)
+        observed = {name: float(values[0]) for name, values in path_metrics(daily).items()}
+        analysis['daily'] = {'distribution': distribution,
+                             'summary': summarize(distribution, observed, confidence)}
+    return analysis
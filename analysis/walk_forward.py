@@ -0,0 +1,234 @@
+"""
+Walk-forward 最佳化：在每個樣本內視窗以網格搜尋挑選參數，再以樣本外視窗驗證，
+各 fold 以多個行程平行執行（共用同一份共享記憶體資料），最後串接樣本外的權益曲線
+"""
+import contextlib
+import io
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from market_data.shared_arrays import SharedOHLCV, attach_frame
+from strategies import jit, metrics
+from strategies.metrics import position_returns
+from strategies.trade_table import TradeTable, as_trade_table, trade_returns
+from .grid_search import METRICS, evaluate_grid, expand_grid, resolve_strategy
+
+_SIZE_PATTERN = re.compile(r'^\s*(\d+)\s*([YMWD])\s*$', re.IGNORECASE)
+
+
+def parse_size(size):
+    """
+    視窗長度：整數為 K 棒數，字串為日曆長度（例如 3Y、6M、4W、30D），亦可直接傳入 DateOffset
+    """
+    if isinstance(size, (int, np.integer, pd.DateOffset)):
+        return size
+    match = _SIZE_PATTERN.match(str(size))
+    if not match:
+        raise ValueError(f"無法解析的視窗長度: {size}，應為 K 棒數或如 3Y、6M、4W、30D 的日曆長度")
+    count, unit = int(match.group(1)), match.group(2).upper()
+    return pd.DateOffset(**{{'Y': 'years', 'M': 'months', 'W': 'weeks', 'D': 'days'}[unit]: count})
+
+
+def make_folds(index: pd.DatetimeIndex, train_size, test_size, step=None, anchored: bool = False) -> list:
+    """
+    產生 fold 的位置區間
+    Args:
+        index: 資料的日期索引
+        train_size / test_size / step: 樣本內、樣本外長度與每次前進的距離（預設等於 test_size）
+        anchored: True 時樣本內視窗固定從第一根開始並逐步擴大，否則為固定長度的滾動視窗
+    Returns:
+        [(train_start, train_end, test_start, test_end), ...]，皆為位置且為左閉右開；
+        最後一個樣本外視窗可能不足 test_size
+    """
+    train_size, test_size = parse_size(train_size), parse_size(test_size)
+    step = test_size if step is None else parse_size(step)
+    n = len(index)
+
+    def advance(pos, size):
+        if isinstance(size, (int, np.integer)):
+            return pos + int(size)
+        if pos >= n:
+            return n
+        return int(np.searchsorted(index, index[pos] + size, side='left'))
+
+    folds = []
+    cursor = 0
+    while True:
+        train_end = advance(cursor, train_size)
+        if train_end >= n:
+            break
+        test_end = min(advance(train_end, test_size), n)
+        if test_end <= train_end or train_end <= cursor:
+            raise ValueError("視窗長度必須至少涵蓋一根 K 棒")
+        folds.append((0 if anchored else cursor, train_end, train_end, test_end))
+        if test_end >= n:
+            break
+        next_cursor = advance(cursor, step)
+        if next_cursor <= cursor:
+            raise ValueError("前進距離必須至少涵蓋一根 K 棒")
+        cursor = next_cursor
+    return folds
+
+
+def _select(combos: list, rows: list, metric: str, min_trades: int):
+    """挑選樣本內績效最佳的參數（忽略 NaN 與交易次數不足者），沒有合格者回傳 (None, None)"""
+    best, best_score = None, None
+    for params, row in zip(combos, rows):
+        score = row[metric]
+        if score is None or np.isnan(score) or row['num_trades'] < min_trades:
+            continue
+        # 回撤越小越好，其餘指標越大越好
+        if metric == 'max_drawdown':
+            score = -score
+        if best_score is None or score > best_score:
+            best, best_score = (params, row), score
+    return best if best else (None, None)
+
+
+def _run_fold(strategy_class, data: pd.DataFrame, fold: tuple, combos: list, metric: str,
+              min_trades: int) -> dict:
+    """執行單一 fold：樣本內網格搜尋，樣本外以最佳參數回測"""
+    train_start, train_end, test_start, test_end = fold
+    train = data.iloc[train_start:train_end]
+    params, in_sample = _select(combos, evaluate_grid(strategy_class, train, combos), metric, min_trades)
+
+    test = data.iloc[test_start:test_end]
+    trades = TradeTable.from_arrays(test.index, test['Close'].to_numpy(), [], [])
+    if params is not None:
+        # 以樣本內資料作為指標的暖機期間，只保留在樣本外進場的交易
+        history = data.iloc[train_start:test_end]
+        strategy = strategy_class(data=history, **params)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = strategy.backtest()
+        trades = as_trade_table(results['trades'], history.index)
+        trades = trades[trades['entry_index'] >= test_start - train_start].reindex(test.index)
+
+    returns = position_returns(test['Close'], trades)
+    fold_returns = trade_returns(trades)
+    return {
+        'fold': fold,
+        'params': params,
+        'in_sample': in_sample,
+        'trades': trades,
+        'returns': returns,
+        'out_of_sample': {
+            'total_return': float(np.prod(1 + fold_returns) - 1) if len(fold_returns) else 0.0,
+            'num_trades': len(trades),
+            'win_rate': float(trades.win_rate()),
+        },
+    }
+
+
+# worker 行程共用的資料（由 initializer 由共享記憶體取得）
+_fold_data = None
+
+
+def _init_fold_worker(handle: dict):
+    global _fold_data
+    _fold_data = attach_frame(handle)
+    jit.warmup()
+
+
+def _run_fold_worker(strategy_class, fold: tuple, combos: list, metric: str, min_trades: int) -> dict:
+    return _run_fold(strategy_class, _fold_data, fold, combos, metric, min_trades)
+
+
+def _summarize(returns: pd.Series, trades: TradeTable) -> dict:
+    """串接後樣本外每日報酬與交易的績效（每日權益曲線的 metrics.METRICS 加上勝率與交易次數）"""
+    summary = metrics.compute(returns.to_numpy(), metrics.positions(trades, returns.index))
+    summary.update({
+        'win_rate': float(trades.win_rate()),
+        'num_trades': len(trades),
+    })
+    return summary
+
+
+def walk_forward(strategy, grid: dict, data: pd.DataFrame = None, ticker: str = None,
+                 start_date: str = None, train_size=756, test_size=252, step=None,
+                 anchored: bool = False, metric: str = 'sharpe_ratio', min_trades: int = 1,
+                 base_params: dict = None, max_workers: int = None) -> dict:
+    """
+    Walk-forward 最佳化
+    Args:
+        strategy: 策略類別或名稱
+        grid: 樣本內搜尋的參數網格 {參數: [候選值, ...]}
+        data: 已載入的 OHLCV；未提供時依 ticker、start_date 載入一次
+        train_size / test_size / step: K 棒數或日曆長度（如 3Y、1Y），預設約為 3 年 / 1 年
+        anchored: 樣本內視窗是否固定從頭開始（擴張視窗）
+        metric: 樣本內挑選參數的指標（METRICS 之一，max_drawdown 取最小）
+        min_trades: 樣本內至少要有的交易次數
+        max_workers: 平行執行 fold 的行程數，預設為 CPU 核心數；1 表示在目前行程執行
+    Returns:
+        {
+            'folds': 每個 fold 一列的表（區間、選出的參數、樣本內與樣本外績效）,
+            'returns': 串接的樣本外每日報酬,
+            'equity': 串接的樣本外權益曲線,
+            'trades': 所有樣本外交易（TradeTable）,
+            'metrics': 串接後的樣本外績效
+        }
+    """
+    if metric not in METRICS:
+        raise ValueError(f"未知的績效指標: {metric}，可用: {', '.join(METRICS)}")
+    strategy_class = resolve_strategy(strategy)
+    if data is None:
+        data = strategy_class(ticker, start_date).data
+    if data is None or data.empty:
+        raise ValueError("沒有數據可供回測")
+
+    folds = make_folds(data.index, train_size, test_size, step, anchored)
+    if not folds:
+        raise ValueError("資料長度不足以切出任何 fold")
+    combos = [{**(base_params or {}), **params} for params in expand_grid(grid)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(folds))
+
+    if max_workers == 1:
+        results = [_run_fold(strategy_class, data, fold, combos, metric, min_trades) for fold in folds]
+    else:
+        shared = SharedOHLCV.create(data)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_fold_worker,
+                                     initargs=(shared.handle,)) as executor:
+                results = list(executor.map(
+                    _run_fold_worker, itertools.repeat(strategy_class), folds, itertools.repeat(combos),
+                    itertools.repeat(metric), itertools.repeat(min_trades)))
+        finally:
+            shared.close()
+            shared.unlink()
+
+    rows = []
+    for result in results:
+        train_start, train_end, test_start, test_end = result['fold']
+        row = {
+            'train_start': data.index[train_start],
+            'train_end': data.index[train_end - 1],
+            'test_start': data.index[test_start],
+            'test_end': data.index[test_end - 1],
+        }
+        row.update({name: value for name, value in (result['params'] or {}).items() if name in grid})
+        row.update({f'is_{name}': (result['in_sample'] or {}).get(name, np.nan) for name in METRICS})
+        row.update({f'oos_{name}': value for name, value in result['out_of_sample'].items()})
+        rows.append(row)
+
+    # 樣本外視窗依序串接；step 小於 test_size 而重疊時，每個 fold 只取到下一個 fold 開始之前
+    pieces, tables = [], []
+    for k, result in enumerate(results):
+        cutoff = data.index[results[k + 1]['fold'][2]] if k + 1 < len(results) else None
+        fold_returns = result['returns']
+        fold_trades = result['trades']
+        if cutoff is not None:
+            fold_returns = fold_returns[fold_returns.index < cutoff]
+            fold_trades = fold_trades[fold_trades.entry_dates < cutoff]
+        pieces.append(fold_returns)
+        tables.append(fold_trades)
+    returns = pd.concat(pieces)
+    trades = TradeTable.concat(tables, data.index)
+    return {
+        'folds': pd.DataFrame(rows),
+        'returns': returns,
+        'equity': (1 + returns).cumprod(),
+        'trades': trades,
+        'metrics': _summarize(returns, trades),
+    }
@@ -12,6 +12,7 @@ from strategies.ma_strategy import MAStrategy
 from strategies.ma_hold_strategy import MAHoldStrategy
 from strategies.rsi_strategy import RSIStrategy
 from strategies.supertrend_strategy import SuperTrendStrategy
+from strategies.result_cache import result_cache
 from views.atr_strategy_view import ATRStrategyView
 
 class StrategyController:
@@ -143,7 +144,7 @@ class StrategyController:
         self.create_strategy_params()
     
     def get_strategy_instance(self, data: pd.DataFrame = None):
-        """根據當前選擇的策略和參數創建策略實例"""
+        """根據當前選擇的策略和參數創建策略實例（可傳入已載入的資料以免重複讀取）"""
         strategy_name = self.strategy_var.get()
         strategy_class = self.strategies[strategy_name]
         
@@ -151,6 +152,7 @@ class StrategyController:
             return strategy_class(
                 ticker=self.ticker_var.get(),
                 start_date=self.start_date_var.get(),
+                data=data,
                 atr_period=self.param_vars['atr_period'].get(),
                 high_period=self.param_vars['high_period'].get(),
                 atr_multiplier=self.param_vars['atr_multiplier'].get(),
@@ -161,6 +163,7 @@ class StrategyController:
             return strategy_class(
                 ticker=self.ticker_var.get(),
                 start_date=self.start_date_var.get(),
+                data=data,
                 short_period=self.param_vars['short_period'].get(),
                 long_period=self.param_vars['long_period'].get()
             )
@@ -168,6 +171,7 @@ class StrategyController:
             return strategy_class(
                 ticker=self.ticker_var.get(),
                 start_date=self.start_date_var.get(),
+                data=data,
                 short_period=self.param_vars['short_period'].get(),
                 long_period=self.param_vars['long_period'].get()
             )
@@ -175,6 +179,7 @@ class StrategyController:
             return strategy_class(
                 ticker=self.ticker_var.get(),
                 start_date=self.start_date_var.get(),
+                data=data,
                 period=self.param_vars['period'].get(),
                 oversold=self.param_vars['oversold'].get(),
                 overbought=self.param_vars['overbought'].get()
@@ -183,6 +188,7 @@ class StrategyController:
             return strategy_class(
                 ticker=self.ticker_var.get(),
                 start_date=self.start_date_var.get(),
+                data=data,
                 period=self.param_vars['period'].get(),
                 multiplier=self.param_vars['multiplier'].get()
             )
@@ -206,8 +212,8 @@ class ATRStrategyController:
             # 創建策略實例
             strategy = self.strategy_controller.get_strategy_instance()
             
-            # 執行回測
-            results = strategy.backtest()
+            # 執行回測（相同資料與參數直接讀取結果快取）
+            results = result_cache.backtest(strategy)
             
             # 顯示結果
             self.view.display_results(results)
@@ -1,19 +1,49 @@
 import tkinter as tk
 import argparse
+import threading
 import matplotlib.pyplot as plt
 from controllers.atr_strategy_controller import ATRStrategyController
 from strategies.atr_strategy import ATRStrategy
 from strategies.ma_strategy import MAStrategy
+from strategies.ma_hold_strategy import MAHoldStrategy
 from strategies.rsi_strategy import RSIStrategy
 from strategies.supertrend_strategy import SuperTrendStrategy
+from market_data.providers import set_default_provider
+from strategies import jit
+from strategies.result_cache import result_cache
+from analysis import grid_search, robustness, successive_halving, walk_forward
 
 def parse_args():
     parser = argparse.ArgumentParser(description='交易策略回測系統')
     parser.add_argument('--cli', action='store_true', help='使用命令列模式')
     parser.add_argument('--strategy', type=str, default='atr', 
-                       choices=['atr', 'ma', 'rsi', 'supertrend'], help='選擇策略 (atr, ma, rsi 或 supertrend)')
+                       choices=['atr', 'ma', 'ma_hold', 'rsi', 'supertrend'], help='選擇策略 (atr, ma, ma_hold, rsi 或 supertrend)')
     parser.add_argument('--ticker', type=str, default='006208.TW', help='股票代碼')
     parser.add_argument('--start_date', type=str, default='2020-01-01', help='開始日期')
+    parser.add_argument('--provider', type=str, default=None,
+                       help='資料來源 (yfinance、synthetic、synthetic:<種子> 或 local:<目錄>)，預設為 yfinance')
+    parser.add_argument('--jit', type=str, default=None, choices=jit.BACKENDS,
+                       help='路徑相依迴圈的 JIT 後端 (auto、numba 或 numpy)，預設 auto：有安裝 numba 就使用')
+    parser.add_argument('--no_result_cache', action='store_true',
+                       help='不讀寫回測結果快取，每次重新回測')
+    parser.add_argument('--bootstrap', type=int, default=0,
+                       help='命令列模式回測後以 bootstrap 重抽指定路徑數，輸出績效的 95%% 信賴區間')
+    # 參數網格搜尋
+    parser.add_argument('--sweep', action='store_true', help='參數網格搜尋模式（需搭配 --grid）')
+    parser.add_argument('--grid', type=str, action='append', default=[],
+                       help='搜尋的參數與候選值，例如 --grid atr_period=10,14,20（可重複指定）')
+    parser.add_argument('--workers', type=int, default=None, help='網格搜尋的平行行程數，預設為 CPU 核心數')
+    parser.add_argument('--sweep_output', type=str, default=None, help='將網格搜尋結果存為 CSV')
+    # Walk-forward 最佳化
+    parser.add_argument('--walk_forward', action='store_true',
+                       help='Walk-forward 最佳化模式：樣本內以 --grid 搜尋參數，樣本外驗證')
+    parser.add_argument('--train_size', type=str, default='3Y', help='樣本內長度（K 棒數或如 3Y、6M 的日曆長度）')
+    parser.add_argument('--test_size', type=str, default='1Y', help='樣本外長度（K 棒數或如 1Y、3M 的日曆長度）')
+    parser.add_argument('--anchored', action='store_true', help='樣本內視窗固定從第一根開始（擴張視窗）')
+    # 連續減半最佳化
+    parser.add_argument('--halving', action='store_true',
+                       help='連續減半最佳化模式：以短歷史淘汰 --grid 的候選，剩下的再以較長歷史評估')
+    parser.add_argument('--eta', type=int, default=3, help='連續減半每輪保留 1/eta 的候選')
     # ATR 策略參數
     parser.add_argument('--atr_period', type=int, default=14, help='ATR 週期')
     parser.add_argument('--high_period', type=int, default=20, help='高點週期')
@@ -32,6 +62,121 @@ def parse_args():
     parser.add_argument('--st_multiplier', type=float, default=3.0, help='SuperTrend 乘數')
     return parser.parse_args()
 
+def get_strategy_params(args):
+    """依命令列參數取得策略類別與其參數"""
+    if args.strategy == 'atr':
+        return ATRStrategy, {
+            'atr_period': args.atr_period,
+            'high_period': args.high_period,
+            'atr_multiplier': args.atr_multiplier,
+            'profit_multiplier': args.profit_multiplier,
+            'max_hold_days': args.max_hold_days
+        }
+    elif args.strategy == 'ma':
+        return MAStrategy, {
+            'short_period': args.short_period,
+            'long_period': args.long_period
+        }
+    elif args.strategy == 'ma_hold':
+        return MAHoldStrategy, {
+            'short_period': args.short_period,
+            'long_period': args.long_period
+        }
+    elif args.strategy == 'rsi':
+        return RSIStrategy, {
+            'period': args.rsi_period,
+            'oversold': args.oversold,
+            'overbought': args.overbought
+        }
+    elif args.strategy == 'supertrend':
+        return SuperTrendStrategy, {
+            'period': args.st_period,
+            'multiplier': args.st_multiplier
+        }
+
+def parse_grid(specs):
+    """解析 --grid name=v1,v2,...，數值自動轉為 int 或 float"""
+    def convert(value):
+        for cast in (int, float):
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+        return value
+
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        if not sep or not values:
+            raise ValueError(f"網格格式錯誤: {spec}，應為 參數=值1,值2")
+        grid[name.strip()] = [convert(v.strip()) for v in values.split(',')]
+    return grid
+
+def parse_window(value):
+    """K 棒數轉為整數，其餘（如 3Y）保留字串"""
+    return int(value) if value.isdigit() else value
+
+def run_walk_forward(args):
+    """執行 walk-forward 最佳化並輸出各 fold 與串接後的樣本外績效"""
+    grid = parse_grid(args.grid)
+    if not grid:
+        raise ValueError("Walk-forward 需要至少一個 --grid 參數")
+    strategy_class, params = get_strategy_params(args)
+    base_params = {name: value for name, value in params.items() if name not in grid}
+    results = walk_forward(strategy_class, grid, ticker=args.ticker, start_date=args.start_date,
+                           train_size=parse_window(args.train_size), test_size=parse_window(args.test_size),
+                           anchored=args.anchored, base_params=base_params, max_workers=args.workers)
+    
+    print(f"\n=== Walk-forward 各 fold（共 {len(results['folds'])} 個）===")
+    print(results['folds'].to_string(index=False))
+    metrics = results['metrics']
+    print("\n=== 樣本外串接績效 ===")
+    print(f"總報酬率: {metrics['total_return']:.2%}")
+    print(f"夏普比率: {metrics['sharpe_ratio']:.2f}")
+    print(f"索提諾比率: {metrics['sortino_ratio']:.2f}")
+    print(f"卡瑪比率: {metrics['calmar_ratio']:.2f}")
+    print(f"最大回撤: {metrics['max_drawdown']:.2%}（{metrics['max_drawdown_duration']} 根K棒）")
+    print(f"勝率: {metrics['win_rate']:.2%}")
+    print(f"交易次數: {metrics['num_trades']}")
+
+def run_halving(args):
+    """執行連續減半最佳化並輸出各輪花費與最後一輪的結果"""
+    grid = parse_grid(args.grid)
+    if not grid:
+        raise ValueError("連續減半需要至少一個 --grid 參數")
+    strategy_class, params = get_strategy_params(args)
+    base_params = {name: value for name, value in params.items() if name not in grid}
+    results = successive_halving(strategy_class, grid, ticker=args.ticker, start_date=args.start_date,
+                                 eta=args.eta, base_params=base_params, max_workers=args.workers)
+    
+    print("\n=== 連續減半各輪 ===")
+    print(results['rungs'].to_string(index=False))
+    print("\n=== 最後一輪結果 ===")
+    print(results['results'].to_string(index=False))
+    cost = results['cost']
+    print(f"\n最佳參數: {results['best']}")
+    print(f"回測次數: {cost['backtests']}，花費為完整網格的 {cost['fraction_of_full_grid']:.1%}")
+
+def run_sweep(args):
+    """執行參數網格搜尋並輸出結果表"""
+    grid = parse_grid(args.grid)
+    if not grid:
+        raise ValueError("網格搜尋需要至少一個 --grid 參數")
+    strategy_class, params = get_strategy_params(args)
+    unknown = [name for name in grid if name not in params]
+    if unknown:
+        raise ValueError(f"{strategy_class.__name__} 沒有參數: {', '.join(unknown)}")
+    
+    base_params = {name: value for name, value in params.items() if name not in grid}
+    results = grid_search(strategy_class, grid, ticker=args.ticker, start_date=args.start_date,
+                          base_params=base_params, max_workers=args.workers)
+    
+    print(f"\n=== 參數網格搜尋結果（共 {len(results)} 組）===")
+    print(results.sort_values('sharpe_ratio', ascending=False).to_string(index=False))
+    if args.sweep_output:
+        results.to_csv(args.sweep_output, index=False)
+        print(f"結果已儲存至 {args.sweep_output}")
+
 def plot_results(df, trades, strategy_type='atr'):
     """繪製結果圖表"""
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 10), gridspec_kw={'height_ratios': [2, 1]})
@@ -45,7 +190,7 @@ def plot_results(df, trades, strategy_type='atr'):
         ax2.plot(df.index, df['ATR'], label='ATR', color='purple')
         ax2.plot(df.index, df['ATR_Mean'], label='ATR Mean', color='orange', alpha=0.5)
         ax2.set_title('ATR 指標')
-    elif strategy_type == 'ma':
+    elif strategy_type in ('ma', 'ma_hold'):
         ax1.plot(df.index, df['Fast_MA'], label='Fast MA', color='green', alpha=0.5)
         ax1.plot(df.index, df['Slow_MA'], label='Slow MA', color='red', alpha=0.5)
         ax2.plot(df.index, df['Fast_MA'] - df['Slow_MA'], label='MA Difference', color='purple')
@@ -87,55 +232,49 @@ def plot_results(df, trades, strategy_type='atr'):
 
 def main():
     args = parse_args()
+    if args.provider:
+        set_default_provider(args.provider)
+    if args.jit:
+        jit.set_backend(args.jit)
+    if args.no_result_cache:
+        result_cache.enabled = False
     
-    if args.cli:
+    if args.walk_forward:
+        run_walk_forward(args)
+    elif args.halving:
+        run_halving(args)
+    elif args.sweep:
+        run_sweep(args)
+    elif args.cli:
         # 命令列模式
-        if args.strategy == 'atr':
-            strategy = ATRStrategy(
-                ticker=args.ticker,
-                start_date=args.start_date,
-                atr_period=args.atr_period,
-                high_period=args.high_period,
-                atr_multiplier=args.atr_multiplier,
-                profit_multiplier=args.profit_multiplier,
-                max_hold_days=args.max_hold_days
-            )
-        elif args.strategy == 'ma':
-            strategy = MAStrategy(
-                ticker=args.ticker,
-                start_date=args.start_date,
-                short_period=args.short_period,
-                long_period=args.long_period
-            )
-        elif args.strategy == 'rsi':
-            strategy = RSIStrategy(
-                ticker=args.ticker,
-                start_date=args.start_date,
-                period=args.rsi_period,
-                oversold=args.oversold,
-                overbought=args.overbought
-            )
-        elif args.strategy == 'supertrend':
-            strategy = SuperTrendStrategy(
-                ticker=args.ticker,
-                start_date=args.start_date,
-                period=args.st_period,
-                multiplier=args.st_multiplier
-            )
+        strategy_class, params = get_strategy_params(args)
+        strategy = strategy_class(ticker=args.ticker, start_date=args.start_date, **params)
         
-        # 執行回測
-        results = strategy.backtest()
+        # 執行回測（相同資料與參數直接讀取結果快取）
+        results = result_cache.backtest(strategy)
         
         # 顯示結果
         print("\n=== 回測結果 ===")
         print(f"總報酬率: {results['total_return']:.2%}")
         print(f"夏普比率: {results['sharpe_ratio']:.2f}")
-        print(f"最大回撤: {results['max_drawdown']:.2%}")
+        print(f"索提諾比率: {results['sortino_ratio']:.2f}")
+        print(f"卡瑪比率: {results['calmar_ratio']:.2f}")
+        print(f"最大回撤: {results['max_drawdown']:.2%}（{results['max_drawdown_duration']} 根K棒）")
+        print(f"曝險比例: {results['exposure']:.2%}")
+        print(f"年化換手次數: {results['turnover']:.1f}")
         print(f"勝率: {results['win_rate']:.2%}")
         print(f"交易次數: {results['num_trades']}")
         
+        if args.bootstrap:
+            analysis = robustness(results, strategy.data, n_paths=args.bootstrap)
+            for name, title in (('trades', '交易報酬重抽'), ('daily', '每日報酬區塊重抽')):
+                if name in analysis:
+                    print(f"\n=== 穩健性分析：{title}（{args.bootstrap} 條路徑）===")
+                    print(analysis[name]['summary'].to_string())
+        
     else:
-        # GUI 模式
+        # GUI 模式（在背景先編譯 JIT 迴圈，第一次回測時不需等待）
+        threading.Thread(target=jit.warmup, daemon=True).start()
         root = tk.Tk()
         app = ATRStrategyController(root)
         root.mainloop()
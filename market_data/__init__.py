@@ -0,0 +1,14 @@
+from .store import ParquetStore, CacheCorruptedError, cache_health, normalize_ohlcv
+from .locking import FileLock
+from .providers import (DataProvider, YFinanceProvider, LocalFileProvider, SyntheticProvider,
+                        create_provider, get_default_provider, set_default_provider)
+from .history import HistoryCache
+from .memory_cache import FrameCache, frame_cache
+from .bulk import RateLimiter, bulk_download
+from .shared_arrays import OHLCVArrays, SharedOHLCV, attach_frame
+
+__all__ = ['ParquetStore', 'CacheCorruptedError', 'cache_health', 'normalize_ohlcv', 'FileLock',
+           'DataProvider', 'YFinanceProvider', 'LocalFileProvider', 'SyntheticProvider',
+           'create_provider', 'get_default_provider', 'set_default_provider',
+           'HistoryCache', 'FrameCache', 'frame_cache', 'RateLimiter', 'bulk_download',
+           'OHLCVArrays', 'SharedOHLCV', 'attach_frame']
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import pandas as pd
+from .history import HistoryCache
+from .providers import get_default_provider
+
+
+class RateLimiter:
+    """令牌桶限速器，限制每秒對資料來源發出的請求數（跨執行緒共用）"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _PrefetchedDownloader:
+    """先回傳批次預先下載的資料，未涵蓋的區間才交給備援下載函式"""
+
+    def __init__(self, frames: list, fallback):
+        self.frames = frames
+        self.fallback = fallback
+
+    def __call__(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        for range_start, range_end, df in self.frames:
+            if range_start <= start and end <= range_end:
+                if df is None or df.empty:
+                    return None
+                index = pd.to_datetime(df.index)
+                return df[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+        return self.fallback(ticker, start, end)
+
+
+def bulk_download(tickers: list, start_date: str, end_date: str = None,
+                  downloader=None, batch_downloader=None, cache: HistoryCache = None,
+                  max_workers: int = 4, batch_size: int = 50, rate_limit: float = 2.0,
+                  retries: int = 3, backoff: float = 1.0) -> dict:
+    """
+    批次下載多檔股票並寫入快取
+    Args:
+        tickers: 股票代碼清單
+        start_date: 開始日期
+        end_date: 結束日期（不含），預設為今天
+        downloader: 單檔下載函式 (ticker, start, end) -> DataFrame，或 DataProvider；
+            預設為 get_default_provider()
+        batch_downloader: 多檔下載函式 (tickers, start, end) -> {ticker: DataFrame}；
+            傳入 DataProvider 時預設使用其 fetch_many，否則每檔各自下載（batch_size 視為 1）
+        cache: 寫入的 HistoryCache，預設依資料來源決定
+        max_workers: 同時執行的下載執行緒數
+        batch_size: 每個批次請求包含的股票數
+        rate_limit: 每秒最多請求數（0 表示不限速）
+        retries: 失敗時的重試次數
+        backoff: 重試間隔秒數（每次加倍）
+    Returns:
+        {'updated': [...], 'cached': [...], 'failed': {ticker: 錯誤訊息}}
+    """
+    end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+    downloader = downloader or get_default_provider()
+    if batch_downloader is None and hasattr(downloader, 'fetch_many'):
+        batch_downloader = downloader.fetch_many
+    cache = cache or HistoryCache(downloader=downloader)
+    if batch_downloader is None:
+        batch_size = 1
+
+    limiter = RateLimiter(rate_limit)
+
+    def call(func, *args):
+        for attempt in range(retries + 1):
+            limiter.acquire()
+            try:
+                return func(*args)
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * (2 ** attempt))
+
+    def fetch_one(ticker, start, end):
+        return call(downloader, ticker, start, end)
+
+    # 依缺少的區間分組，相同區間的股票可合併為一個批次請求
+    result = {'updated': [], 'cached': [], 'failed': {}}
+    groups = defaultdict(list)
+    for ticker in dict.fromkeys(tickers):
+        ranges = tuple(cache.missing_ranges(ticker, start_date, end_date))
+        if ranges:
+            groups[ranges].append(ticker)
+        else:
+            result['cached'].append(ticker)
+
+    def run_batch(batch, ranges):
+        prefetched = defaultdict(list)
+        for start, end in ranges:
+            if batch_downloader is not None:
+                try:
+                    frames = call(batch_downloader, batch, start, end)
+                except Exception:
+                    # 批次請求失敗時改由各檔單獨下載
+                    frames = {}
+                for ticker, df in frames.items():
+                    prefetched[ticker].append((start, end, df))
+            else:
+                for ticker in batch:
+                    prefetched[ticker].append((start, end, fetch_one(ticker, start, end)))
+
+        outcome = {}
+        for ticker in batch:
+            history = HistoryCache(cache.store, _PrefetchedDownloader(prefetched[ticker], fetch_one))
+            try:
+                history.get(ticker, start_date, end_date)
+                outcome[ticker] = None
+            except Exception as e:
+                outcome[ticker] = str(e)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for ranges, group in groups.items():
+            for i in range(0, len(group), batch_size):
+                batch = group[i:i + batch_size]
+                futures[executor.submit(run_batch, batch, ranges)] = batch
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {ticker: str(e) for ticker in futures[future]}
+            for ticker, error in outcome.items():
+                if error is None:
+                    result['updated'].append(ticker)
+                else:
+                    result['failed'][ticker] = error
+
+    print(f"批次下載完成：更新 {len(result['updated'])} 檔，已在快取 {len(result['cached'])} 檔，失敗 {len(result['failed'])} 檔")
+    return result
@@ -0,0 +1,311 @@
+import json
+import os
+import re
+from datetime import datetime
+import pandas as pd
+from .locking import FileLock
+from .providers import get_default_provider
+from .store import (CACHE_DIR, CacheCorruptedError, ParquetStore, atomic_write_json, cache_health,
+                    normalize_ohlcv, safe_ticker)
+
+# 頭尾補抓若回傳空資料且區間超過此天數，視為下載失敗而不推進涵蓋範圍（下次請求時重新補抓）
+MAX_EMPTY_GAP_DAYS = 10
+
+# 增量區段累積到此數量時合併回主檔
+COMPACT_SEGMENTS = 20
+
+
+class HistoryCache:
+    """
+    每檔股票保存一份完整歷史資料與涵蓋範圍（meta.json）
+    任意 start/end 請求皆由歷史資料切片取得，只下載缺少的頭尾區間
+
+    目錄結構：
+        {ticker}/history.parquet        主檔
+        {ticker}/segments/000001.parquet 增量區段（只寫入新資料，定期合併回主檔）
+        {ticker}/meta.json              涵蓋範圍、有效區段清單與各檔案校驗碼
+        {ticker}/.lock                  跨行程讀寫鎖
+    meta.json 最後寫入，未列在其中的區段（例如寫到一半中斷）一律忽略
+    讀取時驗證校驗碼；增量區段損壞時只捨棄區段並補抓，主檔損壞才重新完整下載
+    """
+
+    def __init__(self, store: ParquetStore = None, downloader=None):
+        """
+        Args:
+            store: 快取儲存位置，預設依資料來源決定（見 DataProvider.cache_root）
+            downloader: 資料來源，DataProvider 或 (ticker, start, end) -> DataFrame 函式，
+                預設為 get_default_provider()
+        """
+        self.downloader = downloader or get_default_provider()
+        self.store = store or ParquetStore(getattr(self.downloader, 'cache_root', CACHE_DIR))
+
+    def _history_name(self, ticker: str) -> str:
+        return f"{safe_ticker(ticker)}/history"
+
+    def _segment_name(self, ticker: str, segment: int) -> str:
+        return f"{safe_ticker(ticker)}/segments/{segment:06d}"
+
+    def _meta_path(self, ticker: str) -> str:
+        return os.path.join(self.store.root, safe_ticker(ticker), 'meta.json')
+
+    def _lock(self, ticker: str, shared: bool = False) -> FileLock:
+        return FileLock(os.path.join(self.store.root, safe_ticker(ticker), '.lock'), shared=shared)
+
+    def load_meta(self, ticker: str) -> dict:
+        path = self._meta_path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            cache_health.increment('read_errors')
+            print(f"無法讀取 {path}，將視為無快取: {e}")
+            return None
+
+    def _save_meta(self, ticker: str, meta: dict) -> dict:
+        meta = dict(meta, ticker=ticker, updated_at=datetime.now().isoformat(timespec='seconds'))
+        atomic_write_json(self._meta_path(ticker), meta)
+        return meta
+
+    def _read_history(self, ticker: str, meta: dict) -> pd.DataFrame:
+        """讀取主檔並套用所有增量區段（驗證校驗碼）"""
+        checksums = meta.get('checksums', {})
+        history = self.store.read(self._history_name(ticker), checksums.get('history'))
+        if history is None:
+            raise CacheCorruptedError(f"找不到 {ticker} 的主檔")
+        segments = meta.get('segments', [])
+        if not segments:
+            return history
+        frames = [history]
+        for segment in segments:
+            frame = self.store.read(self._segment_name(ticker, segment), checksums.get(f"{segment:06d}"))
+            if frame is None:
+                raise CacheCorruptedError(f"找不到增量區段 {segment}")
+            frames.append(frame)
+        return normalize_ohlcv(pd.concat(frames))
+
+    def _read_with_recovery(self, ticker: str, meta: dict):
+        """
+        讀取歷史資料；增量區段損壞時退回主檔並縮小涵蓋範圍，讓缺少的頭尾區間重新補抓
+        回傳 (資料, meta)，主檔也無法使用時回傳 (None, None)
+        """
+        try:
+            return self._read_history(ticker, meta), meta
+        except (CacheCorruptedError, OSError, ValueError) as e:
+            print(f"讀取 {ticker} 快取失敗: {e}")
+
+        if meta.get('segments') and 'base_start' in meta:
+            try:
+                history = self.store.read(self._history_name(ticker), meta.get('checksums', {}).get('history'))
+            except (CacheCorruptedError, OSError, ValueError) as e:
+                print(f"主檔亦無法使用: {e}")
+                history = None
+            if history is not None:
+                print(f"捨棄 {ticker} 的增量區段，只補抓主檔之外的區間")
+                cache_health.increment('recoveries')
+                recovered = dict(meta, start=meta['base_start'], end=meta['base_end'], segments=[],
+                                 checksums={'history': meta['checksums']['history']})
+                return history, recovered
+        return None, None
+
+    def _append_segment(self, ticker: str, meta: dict, new_rows: pd.DataFrame,
+                        history: pd.DataFrame, start: str, end: str) -> dict:
+        """只寫入新資料為一個區段；區段過多時合併回主檔"""
+        segments = list(meta.get('segments', []))
+        segment = meta.get('next_segment', 1)
+        checksum = self.store.write(self._segment_name(ticker, segment), new_rows)
+        segments.append(segment)
+        checksums = dict(meta.get('checksums', {}), **{f"{segment:06d}": checksum})
+        meta = self._save_meta(ticker, dict(meta, start=start, end=end, segments=segments,
+                                            next_segment=segment + 1, checksums=checksums))
+
+        if len(segments) >= COMPACT_SEGMENTS:
+            meta = self._compact(ticker, history, meta)
+        return meta
+
+    def compact(self, ticker: str) -> dict:
+        """將增量區段合併回主檔並清除區段檔"""
+        with self._lock(ticker):
+            meta = self.load_meta(ticker)
+            if meta is None:
+                return None
+            return self._compact(ticker, self._read_history(ticker, meta), meta)
+
+    def _compact(self, ticker: str, history: pd.DataFrame, meta: dict) -> dict:
+        print(f"合併 {ticker} 的 {len(meta.get('segments', []))} 個增量區段")
+        checksum = self.store.write(self._history_name(ticker), history)
+        new_meta = self._save_meta(ticker, dict(meta, base_start=meta['start'], base_end=meta['end'],
+                                                segments=[], checksums={'history': checksum}))
+
+        segment_dir = os.path.join(self.store.root, safe_ticker(ticker), 'segments')
+        if os.path.isdir(segment_dir):
+            for filename in os.listdir(segment_dir):
+                os.remove(os.path.join(segment_dir, filename))
+        return new_meta
+
+    def _fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        print(f"下載 {ticker}: {start} -> {end}")
+        df = self.downloader(ticker, start, end)
+        if df is None or df.empty:
+            return None
+        return normalize_ohlcv(df)
+
+    def _migrate_legacy(self, ticker: str):
+        """合併舊版以 {ticker}_{start}_{end} 命名的快取檔，回傳 (資料, start, end)"""
+        if not os.path.isdir(self.store.root):
+            return None
+        pattern = re.compile(rf"^{re.escape(safe_ticker(ticker))}_(\d{{4}}-\d{{2}}-\d{{2}})_(\d{{4}}-\d{{2}}-\d{{2}})\.(csv|parquet)$")
+        ranges = {}
+        for filename in os.listdir(self.store.root):
+            match = pattern.match(filename)
+            if match:
+                start, end, _ = match.groups()
+                ranges[(start, end)] = os.path.splitext(filename)[0]
+        if not ranges:
+            return None
+
+        # 合併相連的區間；區間之間的空缺重新下載，讓全部舊檔合併成一段連續的涵蓋範圍
+        groups = []
+        for start, end in sorted(ranges):
+            if groups and start <= groups[-1]['end']:
+                groups[-1]['end'] = max(groups[-1]['end'], end)
+                groups[-1]['names'].append(ranges[(start, end)])
+            else:
+                groups.append({'start': start, 'end': end, 'names': [ranges[(start, end)]]})
+
+        # 由結束日最晚的一段往前接；空缺無法補齊時停止，較早的舊檔保留不刪除
+        merged = [groups[-1]]
+        gap_frames = []
+        for group in reversed(groups[:-1]):
+            gap_start, gap_end = group['end'], merged[0]['start']
+            fetched = self._fetch(ticker, gap_start, gap_end)
+            cache_health.increment('partial_downloads')
+            if fetched is None and (pd.Timestamp(gap_end) - pd.Timestamp(gap_start)).days > MAX_EMPTY_GAP_DAYS:
+                break
+            if fetched is not None:
+                gap_frames.append(fetched)
+            merged.insert(0, group)
+
+        names = [name for group in merged for name in group['names']]
+        frames = [self.store.read(name) for name in names]
+        frames = [df for df in frames if df is not None and not df.empty]
+        if not frames:
+            return None
+        start, end = merged[0]['start'], merged[-1]['end']
+        print(f"合併舊版快取 {len(names)} 個檔案: {start} -> {end}")
+        history = normalize_ohlcv(pd.concat(frames + gap_frames))
+
+        for name in names:
+            for path in (self.store.path(name), self.store.csv_path(name)):
+                if os.path.exists(path):
+                    os.remove(path)
+        kept = len(ranges) - len(names)
+        if kept:
+            print(f"無法補齊 {start} 之前的空缺，保留 {kept} 個未合併的舊版快取檔")
+        return history, start, end
+
+    def missing_ranges(self, ticker: str, start: str, end: str) -> list:
+        """依 meta.json 判斷 [start, end) 尚未涵蓋的區間（不讀取歷史資料）"""
+        start = pd.Timestamp(start).strftime('%Y-%m-%d')
+        end = pd.Timestamp(end).strftime('%Y-%m-%d')
+        meta = self.load_meta(ticker)
+        if meta is None:
+            return [(start, end)]
+        ranges = []
+        if start < meta['start']:
+            ranges.append((start, meta['start']))
+        if end > meta['end']:
+            ranges.append((meta['end'], end))
+        return ranges
+
+    def get(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        """取得 [start, end) 區間的資料，必要時只補抓缺少的頭尾區間"""
+        start = pd.Timestamp(start).strftime('%Y-%m-%d')
+        end = pd.Timestamp(end).strftime('%Y-%m-%d')
+
+        # 快取已涵蓋時只需共享讀取鎖；需要下載或修復時才取得獨占鎖
+        with self._lock(ticker, shared=True):
+            history = self._read_covered(ticker, start, end)
+        if history is None:
+            with self._lock(ticker):
+                history = self._update(ticker, start, end)
+
+        data = history[(history.index >= pd.Timestamp(start)) & (history.index < pd.Timestamp(end))]
+        if data.empty:
+            raise ValueError(f"無法下載 {ticker} 的數據")
+        return data
+
+    def _read_covered(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        """快取完整涵蓋 [start, end) 且讀取成功時回傳歷史資料，否則回傳 None"""
+        meta = self.load_meta(ticker)
+        if meta is None or start < meta['start'] or end > meta['end']:
+            return None
+        try:
+            return self._read_history(ticker, meta)
+        except (CacheCorruptedError, OSError, ValueError):
+            return None
+
+    def _update(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        """在獨占鎖內補抓缺少的區間並寫入快取，回傳完整歷史資料"""
+        stored_meta = self.load_meta(ticker)
+        history, meta = (None, None)
+        if stored_meta:
+            history, meta = self._read_with_recovery(ticker, stored_meta)
+
+        if history is not None:
+            covered_start, covered_end = meta['start'], meta['end']
+        else:
+            migrated = self._migrate_legacy(ticker)
+            if migrated is not None:
+                history, covered_start, covered_end = migrated
+            else:
+                history = self._fetch(ticker, start, end)
+                if history is None:
+                    raise ValueError(f"無法下載 {ticker} 的數據")
+                cache_health.increment('full_downloads')
+                covered_start, covered_end = start, end
+
+        new_frames = []
+        # 補抓頭端缺少的區間
+        if start < covered_start:
+            fetched = self._fetch(ticker, start, covered_start)
+            cache_health.increment('partial_downloads')
+            if fetched is not None:
+                new_frames.append(fetched)
+                covered_start = start
+            elif (pd.Timestamp(covered_start) - pd.Timestamp(start)).days <= MAX_EMPTY_GAP_DAYS:
+                covered_start = start
+        # 補抓尾端缺少的區間
+        if end > covered_end:
+            fetched = self._fetch(ticker, covered_end, end)
+            cache_health.increment('partial_downloads')
+            if fetched is not None:
+                new_frames.append(fetched)
+                covered_end = end
+            elif (pd.Timestamp(end) - pd.Timestamp(covered_end)).days <= MAX_EMPTY_GAP_DAYS:
+                # 非交易日等原因造成的空資料，仍視為已涵蓋
+                covered_end = end
+
+        if meta is None:
+            # 新建、由舊版快取遷移或主檔損壞：寫入主檔
+            history = normalize_ohlcv(pd.concat([history] + new_frames))
+            checksum = self.store.write(self._history_name(ticker), history)
+            next_segment = stored_meta.get('next_segment', 1) if stored_meta else 1
+            self._save_meta(ticker, {
+                'start': covered_start,
+                'end': covered_end,
+                'base_start': covered_start,
+                'base_end': covered_end,
+                'segments': [],
+                'next_segment': next_segment,
+                'checksums': {'history': checksum},
+            })
+        elif new_frames:
+            # 只將新資料寫成增量區段，不重寫整份歷史
+            new_rows = normalize_ohlcv(pd.concat(new_frames))
+            history = normalize_ohlcv(pd.concat([history, new_rows]))
+            self._append_segment(ticker, meta, new_rows, history, covered_start, covered_end)
+        elif meta is not stored_meta or (covered_start, covered_end) != (meta['start'], meta['end']):
+            self._save_meta(ticker, dict(meta, start=covered_start, end=covered_end))
+        return history
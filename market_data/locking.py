@@ -0,0 +1,70 @@
+import os
+import time
+from .store import cache_health
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    跨行程的檔案讀寫鎖（GUI 與命令列同時存取同一檔股票的快取時使用）
+    POSIX 使用 flock 支援共享讀取鎖；Windows 的 msvcrt 只支援獨占鎖，讀取鎖亦以獨占方式取得
+    """
+
+    def __init__(self, path: str, shared: bool = False, timeout: float = 120.0, poll_interval: float = 0.05):
+        self.path = path
+        self.shared = shared
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _try_lock(self):
+        if fcntl is not None:
+            mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            fcntl.flock(self._fd, mode | fcntl.LOCK_NB)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        started = time.monotonic()
+        waited = False
+        while True:
+            try:
+                self._try_lock()
+                break
+            except OSError:
+                waited = True
+                if self.timeout is not None and time.monotonic() - started > self.timeout:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise TimeoutError(f"等待快取鎖逾時: {self.path}")
+                time.sleep(self.poll_interval)
+        if waited:
+            cache_health.add_lock_wait(time.monotonic() - started)
+        return self
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
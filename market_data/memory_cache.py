@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# 預設記憶體上限 256 MB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """估計 DataFrame 佔用的記憶體大小（含索引）"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    """
+    行程內共用的 OHLCV 資料 LRU 快取，以記憶體用量為上限
+    快取中的 DataFrame 由多個策略實例共用，使用者不應直接修改其內容
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def get(self, key):
+        with self._lock:
+            df = self._frames.get(key)
+            if df is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return df
+
+    def put(self, key, df: pd.DataFrame):
+        size = frame_nbytes(df)
+        with self._lock:
+            if key in self._frames:
+                del self._frames[key]
+                del self._sizes[key]
+            # 單一資料超過上限時不快取
+            if size > self.max_bytes:
+                return
+            self._frames[key] = df
+            self._sizes[key] = size
+            while self.nbytes > self.max_bytes:
+                old_key, _ = self._frames.popitem(last=False)
+                del self._sizes[old_key]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._frames),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# 所有策略共用的快取實例
+frame_cache = FrameCache()
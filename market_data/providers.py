@@ -0,0 +1,216 @@
+import hashlib
+import os
+import zlib
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from .store import CACHE_DIR, safe_ticker
+
+# 合成資料每個亂數區塊的 K 棒數
+BLOCK_SIZE = 4096
+
+
+def _digest(value) -> str:
+    """參數或路徑的短雜湊，用於區分同類資料來源的快取目錄"""
+    return hashlib.blake2b(repr(value).encode('utf-8'), digest_size=4).hexdigest()
+
+
+class DataProvider(ABC):
+    """行情資料來源介面，回傳 [start, end) 區間的日線 OHLCV"""
+
+    # name 用於記憶體快取的鍵，cache_root 為歷史快取目錄；
+    # 產生不同資料的實例（例如不同種子或目錄）必須使用不同的 name 與 cache_root，避免快取互相混用
+    name = 'base'
+    cache_root = CACHE_DIR
+
+    @abstractmethod
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        """下載單檔股票資料"""
+        pass
+
+    def fetch_many(self, tickers: list, start: str, end: str) -> dict:
+        """下載多檔股票資料，回傳 {股票代碼: DataFrame}"""
+        return {ticker: self.fetch(ticker, start, end) for ticker in tickers}
+
+    def __call__(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        return self.fetch(ticker, start, end)
+
+
+class YFinanceProvider(DataProvider):
+    """透過 yfinance 下載 Yahoo Finance 行情"""
+
+    name = 'yfinance'
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.download(ticker, start=start, end=end, progress=False)
+
+    def fetch_many(self, tickers: list, start: str, end: str) -> dict:
+        import yfinance as yf
+        df = yf.download(tickers, start=start, end=end, group_by='ticker', threads=False, progress=False)
+        result = {}
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                frame = df[ticker]
+            else:
+                frame = df
+            result[ticker] = frame.dropna(how='all')
+        return result
+
+
+class LocalFileProvider(DataProvider):
+    """從本機目錄讀取 {ticker}.parquet 或 {ticker}.csv"""
+
+    def __init__(self, root: str):
+        self.root = root
+        # 不同目錄的檔案各自快取
+        path = os.path.abspath(root)
+        self.name = f"local:{path}"
+        self.cache_root = os.path.join(CACHE_DIR, 'local', _digest(path))
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        base = os.path.join(self.root, safe_ticker(ticker))
+        if os.path.exists(f"{base}.parquet"):
+            df = pd.read_parquet(f"{base}.parquet")
+        elif os.path.exists(f"{base}.csv"):
+            df = pd.read_csv(f"{base}.csv", index_col=0, parse_dates=True)
+        else:
+            return pd.DataFrame()
+        index = pd.to_datetime(df.index)
+        return df[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+
+
+class SyntheticProvider(DataProvider):
+    """
+    以固定種子產生的幾何布朗運動加跳躍（jump-diffusion）OHLCV 資料
+    同一組 (seed, ticker) 的價格路徑固定，與請求的區間無關，可離線重現回測與效能測試
+    """
+
+    def __init__(self, seed: int = 0, origin: str = '1990-01-01', start_price: float = 100.0,
+                 mu: float = 0.08, sigma: float = 0.25, jump_intensity: float = 2.0,
+                 jump_mean: float = -0.02, jump_std: float = 0.06, periods_per_year: int = 252):
+        """
+        Args:
+            seed: 亂數種子
+            origin: 價格路徑的起始日，所有區間都由此日起產生後再切片
+            start_price: 起始價格
+            mu: 年化漂移
+            sigma: 年化波動率
+            jump_intensity: 每年平均跳躍次數
+            jump_mean: 跳躍幅度（對數報酬）平均
+            jump_std: 跳躍幅度標準差
+            periods_per_year: 每年的 K 棒數
+        """
+        self.seed = seed
+        self.origin = origin
+        self.start_price = start_price
+        self.mu = mu
+        self.sigma = sigma
+        self.jump_intensity = jump_intensity
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.periods_per_year = periods_per_year
+        # 種子或任何生成參數不同即為不同的價格路徑，各自使用獨立的快取
+        tag = f"{seed}-{_digest((origin, start_price, mu, sigma, jump_intensity, jump_mean, jump_std, periods_per_year))}"
+        self.name = f"synthetic:{tag}"
+        self.cache_root = os.path.join(CACHE_DIR, 'synthetic', tag)
+
+    def _draw(self, ticker: str, n_bars: int) -> dict:
+        """
+        依區塊產生亂數，每個區塊使用 (seed, ticker, 區塊編號) 為種子，
+        因此較短的路徑必定是較長路徑的前段，與請求的長度無關
+        """
+        ticker_key = zlib.crc32(str(ticker).encode('utf-8'))
+        jump_rate = self.jump_intensity / self.periods_per_year
+        normals, jumps = [], []
+        for block in range(-(-n_bars // BLOCK_SIZE)):
+            rng = np.random.default_rng([self.seed, ticker_key, block])
+            normals.append(rng.standard_normal((5, BLOCK_SIZE)))
+            jumps.append(rng.poisson(jump_rate, BLOCK_SIZE))
+        if not normals:
+            normals, jumps = [np.empty((5, 0))], [np.empty(0)]
+        normals = np.concatenate(normals, axis=1)[:, :n_bars]
+        return {
+            'diffusion': normals[0],
+            'jump_noise': normals[1],
+            'gap': normals[2],
+            'range': np.abs(normals[3]),
+            'volume': normals[4],
+            'jumps': np.concatenate(jumps)[:n_bars].astype(float),
+        }
+
+    def generate(self, ticker: str, n_bars: int, start: str = None, freq: str = 'B') -> pd.DataFrame:
+        """
+        產生 n_bars 根 K 棒；大量資料（例如上百萬根）可搭配 freq='min'，
+        並以 periods_per_year 調整為對應的每年 K 棒數
+        """
+        draws = self._draw(ticker, n_bars)
+        dt = 1.0 / self.periods_per_year
+
+        # 對數報酬 = 漂移 + 擴散 + 跳躍
+        jumps = draws['jumps']
+        log_returns = ((self.mu - 0.5 * self.sigma ** 2) * dt
+                       + self.sigma * np.sqrt(dt) * draws['diffusion']
+                       + jumps * self.jump_mean + np.sqrt(jumps) * self.jump_std * draws['jump_noise'])
+        close = self.start_price * np.exp(np.cumsum(log_returns))
+
+        # 開盤價帶有跳空，最高/最低價包住開收盤價
+        intraday = self.sigma * np.sqrt(dt)
+        prev_close = np.concatenate(([self.start_price], close[:-1]))
+        open_ = prev_close * np.exp(intraday * 0.3 * draws['gap'])
+        high = np.maximum(open_, close) * np.exp(intraday * 0.5 * draws['range'])
+        low = np.minimum(open_, close) * np.exp(-intraday * 0.5 * draws['range'])
+        volume = np.exp(13.0 + 0.5 * draws['volume']).astype('int64')
+
+        index = pd.date_range(start or self.origin, periods=n_bars, freq=freq, name='Date')
+        return pd.DataFrame({
+            'Open': open_,
+            'High': high,
+            'Low': low,
+            'Close': close,
+            'Volume': volume,
+        }, index=index)
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        n_bars = len(pd.bdate_range(self.origin, pd.Timestamp(end) - pd.Timedelta(days=1)))
+        if n_bars <= 0:
+            return pd.DataFrame()
+        df = self.generate(ticker, n_bars)
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+    def universe(self, n_tickers: int, prefix: str = 'SYN') -> list:
+        """產生 n_tickers 個合成股票代碼"""
+        return [f"{prefix}{i:05d}" for i in range(n_tickers)]
+
+
+_default_provider = None
+
+
+def create_provider(spec: str) -> DataProvider:
+    """依名稱建立資料來源：yfinance、synthetic、synthetic:<seed> 或 local:<目錄>"""
+    name, _, arg = spec.partition(':')
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'synthetic':
+        return SyntheticProvider(seed=int(arg) if arg else 0)
+    if name == 'local':
+        if not arg:
+            raise ValueError("local 資料來源需要指定目錄，例如 local:market_files")
+        return LocalFileProvider(arg)
+    raise ValueError(f"未知的資料來源: {spec}")
+
+
+def get_default_provider() -> DataProvider:
+    """取得預設資料來源，可用環境變數 ATR_DATA_PROVIDER 指定（預設為 yfinance）"""
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = create_provider(os.environ.get('ATR_DATA_PROVIDER', 'yfinance'))
+    return _default_provider
+
+
+def set_default_provider(provider):
+    """設定預設資料來源，可傳入 DataProvider 或名稱字串"""
+    global _default_provider
+    _default_provider = create_provider(provider) if isinstance(provider, str) else provider
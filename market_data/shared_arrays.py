@@ -0,0 +1,106 @@
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class OHLCVArrays:
+    """
+    以連續 numpy 陣列保存的 OHLCV：dates 為 int64（奈秒時間戳），values 為 (K 棒數, 欄位數) 的 float64
+    可放在 shared_memory 中（見 SharedOHLCV），多個行程共用同一份實體記憶體
+    """
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, columns: list = None):
+        self.dates = dates
+        self.values = values
+        self.columns = list(columns or OHLCV_COLUMNS)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: list = None) -> 'OHLCVArrays':
+        columns = [col for col in (columns or OHLCV_COLUMNS) if col in df.columns]
+        dates = pd.DatetimeIndex(df.index).as_unit('ns').asi8.copy()
+        values = np.ascontiguousarray(df[columns].to_numpy(dtype='float64'))
+        return cls(dates, values, columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """取得單一欄位（陣列視圖，不複製）"""
+        return self.values[:, self.columns.index(name)]
+
+    def slice(self, start: str = None, end: str = None) -> 'OHLCVArrays':
+        """以日期切出 [start, end) 區間（陣列視圖，不複製）"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, pd.Timestamp(start).value, side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, pd.Timestamp(end).value, side='left'))
+        return OHLCVArrays(self.dates[lo:hi], self.values[lo:hi], self.columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """包裝為 DataFrame；所有欄位共用同一個 float64 區塊，不複製資料（成交量亦為 float64）"""
+        index = pd.DatetimeIndex(self.dates.view('datetime64[ns]'), name='Date')
+        return pd.DataFrame(self.values, index=index, columns=self.columns, copy=False)
+
+
+class SharedOHLCV:
+    """
+    放在 multiprocessing.shared_memory 的 OHLCV 陣列
+    主行程以 create() 建立並將 handle 傳給 worker，worker 以 attach() 取得零複製的視圖
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, n_bars: int, columns: list, owner: bool):
+        self.shm = shm
+        self.columns = list(columns)
+        self.owner = owner
+        n_cols = len(self.columns)
+        dates = np.ndarray((n_bars,), dtype='int64', buffer=shm.buf)
+        values = np.ndarray((n_bars, n_cols), dtype='float64', buffer=shm.buf, offset=n_bars * 8)
+        if not owner:
+            dates.flags.writeable = False
+            values.flags.writeable = False
+        self.arrays = OHLCVArrays(dates, values, self.columns)
+
+    @classmethod
+    def create(cls, data) -> 'SharedOHLCV':
+        """由 DataFrame 或 OHLCVArrays 建立共享記憶體（呼叫端負責 unlink）"""
+        arrays = data if isinstance(data, OHLCVArrays) else OHLCVArrays.from_frame(data)
+        n_bars, n_cols = len(arrays), len(arrays.columns)
+        shm = shared_memory.SharedMemory(create=True, size=max(n_bars * (1 + n_cols) * 8, 1))
+        shared = cls(shm, n_bars, arrays.columns, owner=True)
+        shared.arrays.dates[:] = arrays.dates
+        shared.arrays.values[:] = arrays.values
+        return shared
+
+    @property
+    def handle(self) -> dict:
+        """可 pickle 的描述，傳給 worker 行程以 attach() 使用"""
+        return {'name': self.shm.name, 'n_bars': len(self.arrays), 'columns': self.columns}
+
+    @classmethod
+    def attach(cls, handle: dict) -> 'SharedOHLCV':
+        shm = shared_memory.SharedMemory(name=handle['name'])
+        return cls(shm, handle['n_bars'], handle['columns'], owner=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.arrays.to_frame()
+
+    def close(self):
+        # 先釋放 numpy 視圖，否則 shared_memory 無法關閉
+        self.arrays = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# 每個 worker 行程只 attach 一次，之後重複使用同一個 DataFrame 視圖
+_attached = {}
+
+
+def attach_frame(handle: dict) -> pd.DataFrame:
+    """在 worker 行程中取得共享記憶體資料的 DataFrame 視圖（零複製、唯讀）"""
+    name = handle['name']
+    if name not in _attached:
+        shared = SharedOHLCV.attach(handle)
+        _attached[name] = (shared, shared.to_frame())
+    return _attached[name][1]
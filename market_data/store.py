@@ -0,0 +1,165 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import pandas as pd
+
+CACHE_DIR = 'debug_data'
+
+# 價格欄位一律存為 float64，成交量存為 int64
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close']
+VOLUME_COLUMN = 'Volume'
+
+
+class CacheCorruptedError(ValueError):
+    """快取檔案內容與記錄的校驗碼不符或無法解析"""
+    pass
+
+
+class CacheHealth:
+    """快取健康狀態計數器（讀寫次數、校驗失敗、鎖等待、局部修復與完整重新下載）"""
+
+    FIELDS = ['reads', 'writes', 'checksum_failures', 'read_errors', 'recoveries',
+              'partial_downloads', 'full_downloads', 'lock_waits']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {field: 0 for field in self.FIELDS}
+            self.lock_wait_seconds = 0.0
+
+    def increment(self, field: str, amount: int = 1):
+        with self._lock:
+            self.counters[field] += amount
+
+    def add_lock_wait(self, seconds: float):
+        with self._lock:
+            self.counters['lock_waits'] += 1
+            self.lock_wait_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, lock_wait_seconds=round(self.lock_wait_seconds, 3))
+
+
+# 行程內共用的快取健康計數器
+cache_health = CacheHealth()
+
+
+def checksum_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def safe_ticker(ticker: str) -> str:
+    """將股票代碼轉為可用於檔名的字串"""
+    return str(ticker).replace('/', '_').replace('\\', '_')
+
+
+def normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """統一 OHLCV 格式：攤平欄位、DatetimeIndex、排序去重並固定欄位型別"""
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index
+    df.index.name = 'Date'
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('float64')
+    if VOLUME_COLUMN in df.columns:
+        df[VOLUME_COLUMN] = df[VOLUME_COLUMN].fillna(0).astype('int64')
+    return df
+
+
+def atomic_write(path: str, writer):
+    """先寫入同目錄的暫存檔再以 os.replace 換名，避免寫到一半中斷造成檔案損壞"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path: str, obj):
+    """以原子方式寫入 JSON 檔"""
+    def writer(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+    atomic_write(path, writer)
+
+
+class ParquetStore:
+    """以 Parquet 欄式格式保存行情快取，並自動遷移舊的 CSV 快取"""
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.parquet")
+
+    def csv_path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.csv")
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name)) or os.path.exists(self.csv_path(name))
+
+    def read(self, name: str, checksum: str = None) -> pd.DataFrame:
+        """
+        讀取快取；若只有舊的 CSV 快取則轉存為 Parquet 後回傳
+        提供 checksum 時先驗證檔案內容，不符則拋出 CacheCorruptedError
+        """
+        path = self.path(name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                content = f.read()
+            cache_health.increment('reads')
+            if checksum is not None and checksum_bytes(content) != checksum:
+                cache_health.increment('checksum_failures')
+                raise CacheCorruptedError(f"快取校驗碼不符: {path}")
+            try:
+                return pd.read_parquet(io.BytesIO(content))
+            except (OSError, ValueError) as e:
+                cache_health.increment('read_errors')
+                raise CacheCorruptedError(f"無法解析快取檔案 {path}: {e}") from e
+
+        csv_path = self.csv_path(name)
+        if os.path.exists(csv_path):
+            print(f"遷移 CSV 快取至 Parquet: {csv_path}")
+            df = normalize_ohlcv(pd.read_csv(csv_path, index_col=0, parse_dates=True))
+            self.write(name, df)
+            return df
+        return None
+
+    def write(self, name: str, df: pd.DataFrame) -> str:
+        """以原子方式寫入快取，回傳檔案內容的校驗碼"""
+        buffer = io.BytesIO()
+        normalize_ohlcv(df).to_parquet(buffer, engine='pyarrow')
+        content = buffer.getvalue()
+
+        def writer(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+        atomic_write(self.path(name), writer)
+        cache_health.increment('writes')
+        return checksum_bytes(content)
+
+    def remove(self, name: str):
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(path)
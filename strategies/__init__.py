@@ -1,7 +1,19 @@
 from .base_strategy import BaseStrategy
 from .atr_strategy import ATRStrategy
 from .ma_strategy import MAStrategy
+from .ma_hold_strategy import MAHoldStrategy
 from .rsi_strategy import RSIStrategy
 from .supertrend_strategy import SuperTrendStrategy
+from .trade_table import TradeTable
+from . import compact, indicators, jit, metrics
 
-__all__ = ['BaseStrategy', 'ATRStrategy', 'MAStrategy', 'RSIStrategy', 'SuperTrendStrategy']
\ No newline at end of file
+# 命令列與參數搜尋使用的策略名稱
+STRATEGIES = {
+    'atr': ATRStrategy,
+    'ma': MAStrategy,
+    'ma_hold': MAHoldStrategy,
+    'rsi': RSIStrategy,
+    'supertrend': SuperTrendStrategy,
+}
+
+__all__ = ['BaseStrategy', 'ATRStrategy', 'MAStrategy', 'MAHoldStrategy', 'RSIStrategy', 'SuperTrendStrategy', 'STRATEGIES', 'TradeTable', 'compact', 'indicators', 'jit', 'metrics']
\ No newline at end of file
@@ -1,12 +1,19 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseStrategy
+from . import indicators, kernels
 
 class ATRStrategy(BaseStrategy):
-    def __init__(self, ticker: str, start_date: str, atr_period: int = 14, high_period: int = 20,
+    # 止損、獲利倍數與持倉天數只影響出場，改變時沿用已算好的指標與信號
+    STAGE_PARAMETERS = {
+        'indicators': ('atr_period', 'high_period'),
+        'trades': ('atr_multiplier', 'profit_multiplier', 'max_hold_days'),
+    }
+
+    def __init__(self, ticker: str = None, start_date: str = None, atr_period: int = 14, high_period: int = 20,
                  atr_multiplier: float = 1.5, profit_multiplier: float = 2.0,
-                 max_hold_days: int = 20):
-        super().__init__(ticker, start_date)
+                 max_hold_days: int = 20, data: pd.DataFrame = None):
+        super().__init__(ticker, start_date, data)
         self.atr_period = atr_period
         self.high_period = high_period
         self.atr_multiplier = atr_multiplier
@@ -25,23 +32,39 @@ class ATRStrategy(BaseStrategy):
             'max_hold_days': self.max_hold_days
         }
     
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        strategies = [cls(data=data, **params) for params in param_sets]
+        periods = sorted({s.atr_period for s in strategies})
+        indicators.atr_multi(data, periods)
+        indicators.atr_mean_multi(data, periods, periods)
+        for window in sorted({s.high_period for s in strategies}):
+            indicators.rolling_max(data, window, 'High')
+    
+    def compute_indicators(self) -> dict:
+        # 計算 ATR 與高點（共用指標快取，同一份資料只計算一次）
+        return {
+            'ATR': indicators.atr(self.data, self.atr_period),
+            'ATR_Mean': indicators.atr_mean(self.data, self.atr_period, self.atr_period),
+            '20D_High': indicators.rolling_max(self.data, self.high_period, 'High'),
+        }
+    
     def generate_signals(self) -> pd.DataFrame:
-        df = self.data.copy()
-        
-        # 計算 ATR
-        high_low = df['High'] - df['Low']
-        high_close = np.abs(df['High'] - df['Close'].shift())
-        low_close = np.abs(df['Low'] - df['Close'].shift())
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = np.max(ranges, axis=1)
-        df['ATR'] = true_range.rolling(self.atr_period).mean()
-        df['ATR_Mean'] = df['ATR'].rolling(window=self.atr_period).mean()
-        
-        # 計算高點
-        df['20D_High'] = df['High'].rolling(self.high_period).max()
-        
-        # 生成信號
-        df['Signal'] = 0
-        df.loc[df['Close'] > df['20D_High'].shift(1), 'Signal'] = 1
+        return self.run_stage('signals').copy(deep=False)
+    
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        close = self.data['Close'].to_numpy()
         
-        return df 
\ No newline at end of file
+        # 生成信號：收盤價突破前一根的區間高點
+        breakout = close > kernels.previous(indicator_values['20D_High'].to_numpy())
+        return self.signal_frame(indicator_values, breakout.astype('int64'))
+
+    def get_exit_rules(self, signals: pd.DataFrame) -> dict:
+        """以進場當根的 ATR 設定止損與獲利了結價，並限制最長持倉天數"""
+        close = self.data['Close'].to_numpy()
+        atr = signals['ATR'].to_numpy()
+        return {
+            'stop_loss': close - self.atr_multiplier * atr,
+            'take_profit': close + self.profit_multiplier * atr,
+            'max_hold_days': self.max_hold_days
+        } 
\ No newline at end of file
@@ -1,92 +1,66 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime
-import os
+from market_data.history import HistoryCache
+from market_data.memory_cache import frame_cache
+from market_data.providers import get_default_provider
+from . import compact, indicators, kernels, metrics, pipeline
+from .trade_table import SIGNAL_REVERSAL, TradeTable
 
 class BaseStrategy(ABC):
+    # 所有策略子類別共用的記憶體快取，重複回測同一檔股票時不需重新讀檔
+    frame_cache = frame_cache
+    # 回測邏輯或結果格式變更時遞增，使磁碟上的回測結果快取失效（子類別可各自宣告）
+    VERSION = 1
+    # 各參數所屬的計算階段（indicators、signals、trades，見 pipeline），參數改變時只重新計算該階段與下游；
+    # 未列出的參數視為影響 indicators。get_parameters() 必須包含所有影響結果的參數
+    STAGE_PARAMETERS = {}
+
     def __init__(self, ticker: str = None, start_date: str = None, data: pd.DataFrame = None):
         self.ticker = ticker
         self.start_date = start_date
         self.end_date = datetime.now().strftime('%Y-%m-%d')
-        self.data = data
+        # 可直接注入已載入的資料（多個策略可共用同一份唯讀資料）；
+        # 否則延遲到第一次存取 data 時才載入
+        self._data = data
         self.positions = []
         self.trades = []
-        
-        if ticker and start_date:
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """策略使用的 OHLCV 資料，第一次存取時才下載或讀取快取"""
+        if self._data is None and self.ticker and self.start_date:
             self.download_data()
+        return self._data
+
+    @data.setter
+    def data(self, value: pd.DataFrame):
+        self._data = value
     
     def download_data(self):
         """下載股票數據"""
         if not self.ticker or not self.start_date:
             raise ValueError("需要提供股票代碼和開始日期")
 
-        # 準備快取檔路徑
-        os.makedirs('debug_data', exist_ok=True)
-        safe_ticker = str(self.ticker).replace('/', '_').replace('\\', '_')
-        csv_path = f"debug_data/{safe_ticker}_{self.start_date}_{self.end_date}.csv"
-
-        # 若 CSV 快取存在則優先載入並檢查是否涵蓋至今日（目標 end_date）
-        if os.path.exists(csv_path):
-            try:
-                print(f"讀取快取檔案: {csv_path}")
-                self.data = pd.read_csv(csv_path, index_col=0, parse_dates=True)
-                if self.data.empty:
-                    raise ValueError(f"快取檔案存在但內容為空: {csv_path}")
-
-                cached_end_date = pd.to_datetime(self.data.index.max()).normalize()
-                target_end_date = pd.to_datetime(self.end_date).normalize()
-                print(f"快取最後一天: {cached_end_date}, 目標最後一天: {target_end_date}（允許落後 1 天）")
-                # 快取若已涵蓋至目標 end_date - 1 天，直接使用
-                if cached_end_date >= (target_end_date - pd.Timedelta(days=1)):
-                    print("快取已在允許範圍內（相差 1 天內），使用快取資料")
-                    return self.data
-
-                # 否則進行增量更新（從快取最後一天的下一天開始下載）
-                update_start_date = (cached_end_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
-                print(f"快取未涵蓋至今日，增量更新: {update_start_date} -> {self.end_date}")
-                incremental_data = yf.download(self.ticker, start=update_start_date, end=self.end_date)
-
-                if isinstance(incremental_data.columns, pd.MultiIndex):
-                    incremental_data.columns = incremental_data.columns.get_level_values(0)
-
-                if not incremental_data.empty:
-                    combined_data = pd.concat([self.data, incremental_data]).sort_index()
-                    combined_data = combined_data[~combined_data.index.duplicated(keep='last')]
-                    self.data = combined_data
-                # 若沒有新增資料（例如非交易日），沿用原快取
-
-                # 儲存更新後的快取
-                try:
-                    self.data.to_csv(csv_path, encoding='utf-8-sig')
-                except Exception:
-                    pass
-                return self.data
-            except Exception:
-                # 快取損壞或讀取失敗，將在下方進行完整下載
-                self.data = None
-        else:
-            # 無快取或讀取失敗，改為完整下載資料
-            self.data = yf.download(self.ticker, start=self.start_date, end=self.end_date)
-        if self.data.empty:
-            raise ValueError(f"無法下載 {self.ticker} 的數據")
-
-        if isinstance(self.data.columns, pd.MultiIndex):
-            self.data.columns = self.data.columns.get_level_values(0)
-
-        # 將原始數據另存為 CSV 以利除錯
-        try:
-            self.data.to_csv(csv_path, encoding='utf-8-sig')
-        except Exception:
-            # 若寫檔失敗，忽略錯誤以免影響主流程
-            pass
+        provider = get_default_provider()
+        key = (provider.name, self.ticker, self.start_date, self.end_date)
+        cached = self.frame_cache.get(key)
+        if cached is not None:
+            self.data = cached
+            return self.data
 
+        # 由每檔股票的完整歷史快取切片，只下載缺少的頭尾區間
+        self.data = HistoryCache(downloader=provider).get(self.ticker, self.start_date, self.end_date)
+        self.frame_cache.put(key, self.data)
         return self.data
     
     @abstractmethod
     def generate_signals(self) -> pd.DataFrame:
-        """生成交易信號"""
+        """
+        生成交易信號
+        經由階段管線的實作應回傳快取信號表的淺複本（copy(deep=False)），呼叫端新增欄位不會影響快取
+        """
         pass
     
     @abstractmethod
@@ -94,60 +68,125 @@ class BaseStrategy(ABC):
         """獲取策略參數"""
         pass
     
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        """參數搜尋前，批次預先計算多組參數會用到的指標並放入指標快取（預設不做事）"""
+        pass
+    
     @abstractmethod
     def get_name(self) -> str:
         """獲取策略名稱"""
         pass
     
     def backtest(self) -> dict:
-        """執行回測"""
+        """執行回測（經由階段管線，參數相同的階段直接沿用快取結果）"""
         if self.data is None:
             raise ValueError("沒有數據可供回測")
-            
-        signals = self.generate_signals()
-        trades = []
-        position = 0
-        entry_price = 0
-        entry_date = None
-        
-        for i in range(len(signals)):
-            current_signal = signals['Signal'].iloc[i]
-            current_price = signals['Close'].iloc[i]
-            current_date = signals.index[i]
-            
-            # 開倉
-            if position == 0 and current_signal == 1:
-                position = 1
-                entry_price = current_price
-                entry_date = current_date
-            # 平倉
-            elif position == 1 and current_signal == -1:
-                trades.append({
-                    'entry_date': entry_date,
-                    'entry_price': entry_price,
-                    'exit_date': current_date,
-                    'exit_price': current_price,
-                    'exit_reason': '信號反轉'
-                })
-                position = 0
-        
+        return dict(self.run_stage('metrics'))
+    
+    def run_stage(self, stage: str):
+        """取得管線中某個階段（indicators、signals、trades、metrics）的結果，結果為唯讀"""
+        return pipeline.run(self, stage)
+    
+    def compute_indicators(self) -> dict:
+        """indicators 階段：計算信號所需的指標 {欄位名稱: Series}（預設沒有）"""
+        return {}
+    
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        """
+        signals 階段：由指標產生含 Signal 欄位的 DataFrame
+        預設呼叫 generate_signals()，只實作 generate_signals 的子類別不需修改
+        """
+        return self.generate_signals()
+    
+    def signal_frame(self, indicator_values: dict, signal: np.ndarray) -> pd.DataFrame:
+        """
+        只含指標與 Signal 欄位的信號表（與 data 同索引），不複製 OHLCV；
+        指標欄位直接引用指標快取的陣列（以唯讀視圖引用，就地修改會引發錯誤而不會汙染快取），
+        價格請由 self.data 讀取；資料為精簡模式（見 compact）時指標轉為 float32、Signal 轉為 int8
+        """
+        columns = dict(indicator_values)
+        columns['Signal'] = signal
+        if compact.is_compact(self.data):
+            columns = compact.compact_columns(columns)
+        for name, values in columns.items():
+            view = np.asarray(values).view()
+            view.flags.writeable = False
+            columns[name] = view
+        return pd.DataFrame(columns, index=self.data.index, copy=False)
+    
+    def compute_trades(self, signals: pd.DataFrame) -> TradeTable:
+        """trades 階段：依出場規則（或信號反轉）產生交易紀錄"""
+        rules = self.get_exit_rules(signals)
+        if rules is None:
+            # 由信號欄位直接推導進出場位置（空手遇 1 開倉、持倉遇 -1 平倉）
+            entry_idx, exit_idx = kernels.signal_trades(signals['Signal'].to_numpy())
+            trades = TradeTable.from_arrays(signals.index, self.data['Close'].to_numpy(),
+                                            entry_idx, exit_idx, SIGNAL_REVERSAL)
+        else:
+            trades = self.run_exit_engine(signals, rules)
+        return trades
+    
+    def compute_metrics(self, signals: pd.DataFrame, trades: TradeTable) -> dict:
+        """metrics 階段：交易報酬與績效指標"""
         # 計算報酬率
         returns, trades = self.calculate_returns(trades)
         
-        # 計算績效指標
-        performance = {
+        # 計算績效指標（夏普比率、回撤等以每日持倉的權益曲線計算）
+        performance = self.calculate_performance(self.data['Close'], trades)
+        performance.update({
             'total_return': self.calculate_total_return(returns),
-            'sharpe_ratio': self.calculate_sharpe_ratio(returns),
-            'max_drawdown': self.calculate_drawdown(returns),
             'win_rate': self.calculate_win_rate(trades),
             'num_trades': len(trades),
             'trades': trades
-        }
+        })
         
         return performance
     
+    def calculate_performance(self, close: pd.Series, trades) -> dict:
+        """
+        由交易紀錄推導每日持倉與權益曲線，計算夏普比率、索提諾比率、卡瑪比率、
+        最大回撤與其持續K棒數、曝險比例與年化換手次數（見 metrics.METRICS）
+        """
+        return metrics.trade_metrics(close, trades)
+    
+    def get_exit_rules(self, signals: pd.DataFrame) -> dict:
+        """
+        出場規則，預設為 None（以信號反轉出場）
+        子類別可回傳 dict 改用出場引擎，以下鍵值皆可省略：
+            stop_loss / take_profit: 以進場K棒計算的止損價、獲利了結價（與 data 對齊的陣列或 Series）
+            trailing_stop: 移動止損距離（進場後最高收盤價減此距離）
+            max_hold_days: 最長持倉天數
+        """
+        return None
+
+    def run_exit_engine(self, signals: pd.DataFrame, rules: dict, start: int = 0,
+                        keep_open: bool = False) -> TradeTable:
+        """以出場引擎產生交易紀錄，keep_open 為 True 時保留最後未平倉的交易"""
+        def levels(name):
+            value = rules.get(name)
+            return None if value is None else np.asarray(value, dtype='float64')
+
+        close = self.data['Close'].to_numpy()
+        max_hold_days = rules.get('max_hold_days')
+        entry_idx, exit_idx, reasons = kernels.exit_trades(
+            signals['Signal'].to_numpy(),
+            close,
+            times=indicators.time_index(self.data) if max_hold_days is not None else None,
+            stop_loss=levels('stop_loss'),
+            take_profit=levels('take_profit'),
+            trailing=levels('trailing_stop'),
+            max_hold=None if max_hold_days is None else max_hold_days * indicators.NS_PER_DAY,
+            start=start
+        )
+
+        return TradeTable.from_arrays(signals.index, close, entry_idx, exit_idx,
+                                      reasons, levels('stop_loss'), levels('take_profit'), keep_open)
+
     def calculate_returns(self, trades):
-        """計算交易報酬率"""
+        """計算交易報酬率（TradeTable 建立時已整欄算好，list of dict 則逐筆計算）"""
+        if isinstance(trades, TradeTable):
+            return trades.returns, trades
         if not trades:
             return [], []
         
@@ -164,35 +203,14 @@ class BaseStrategy(ABC):
     
     def calculate_total_return(self, returns):
         """計算總報酬率"""
-        if not returns:
+        if len(returns) == 0:
             return 0
         return np.prod(1 + np.array(returns)) - 1
     
-    def calculate_sharpe_ratio(self, returns, risk_free_rate=0.02):
-        """計算夏普比率"""
-        if not returns:
-            return 0
-        
-        returns = np.array(returns, dtype=float)
-        excess_returns = returns - risk_free_rate/252
-        if len(excess_returns) < 2:
-            return 0
-        
-        return float(np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(252))
-    
-    def calculate_drawdown(self, returns):
-        """計算最大回撤"""
-        if not returns:
-            return 0
-        
-        returns = np.array(returns, dtype=float)
-        cumulative_returns = np.cumprod(1 + returns)
-        running_max = np.maximum.accumulate(cumulative_returns)
-        drawdown = (running_max - cumulative_returns) / running_max
-        return float(np.max(drawdown))
-    
     def calculate_win_rate(self, trades):
         """計算勝率"""
+        if isinstance(trades, TradeTable):
+            return trades.win_rate()
         if not trades:
             return 0
         
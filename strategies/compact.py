@@ -0,0 +1,177 @@
+"""
+精簡表示模式（選用）：價格與指標以 float32、信號以 int8、布林欄位以位元打包保存，
+在記憶體中同時保留大量股票（例如全市場篩選）時，價格與指標的用量減半、信號由 8 bytes 降為 1 byte
+
+以 compact_ohlcv() 轉換後的資料建立策略即為精簡模式：信號表的指標欄位為 float32、Signal 為 int8；
+交易價格與績效仍以 float64 計算，差異只來自價格與指標的 float32 捨入。
+需要長期保存多檔股票的信號時，以 CompactSignals 再將布林欄位（如 InUptrend）打包為位元
+
+與 float64 結果的容許誤差（TOLERANCES，verify() 逐項檢查）：
+    price: 價格的最大相對誤差，float32 的捨入上限為 2**-24 ≈ 6e-8
+    indicator: 指標的最大誤差除以該欄位的最大絕對值（實測約 1e-6，RSI 等由價差計算的指標較大）
+    signal: 信號不同的K棒比例；只發生在比較的兩邊在捨入範圍內相等時（例如兩條均線幾乎重合）
+    metric: 交易完全相同時，報酬類績效（總報酬、年化報酬、最大回撤、勝率）的最大絕對誤差
+信號不同時交易也可能不同，此時不比較績效（trades_identical 為 False）
+"""
+import numpy as np
+import pandas as pd
+from market_data.store import PRICE_COLUMNS
+
+TOLERANCES = {
+    'price': 1e-7,
+    'indicator': 1e-4,
+    'signal': 1e-3,
+    'metric': 1e-4,
+}
+
+# verify() 比較的績效指標
+COMPARED_METRICS = ('total_return', 'annual_return', 'max_drawdown', 'win_rate')
+
+
+def compact_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """價格欄位轉為 float32 的 OHLCV（成交量等其他欄位不變），以此建立的策略即為精簡模式"""
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if name in PRICE_COLUMNS and values.dtype.kind == 'f':
+            values = values.astype('float32')
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def is_compact(df: pd.DataFrame) -> bool:
+    """資料是否為精簡模式（收盤價為 float32）"""
+    return df is not None and 'Close' in df.columns and df['Close'].dtype == np.float32
+
+
+def compact_columns(columns: dict) -> dict:
+    """信號表欄位的精簡型別：浮點數為 float32、Signal 為 int8，布林欄位不變（每根 1 byte）"""
+    result = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if name == 'Signal':
+            values = values.astype('int8')
+        elif values.dtype.kind == 'f':
+            values = values.astype('float32')
+        result[name] = values
+    return result
+
+
+class PackedBools:
+    """以位元打包的布林陣列（每根K棒 1 bit）"""
+
+    def __init__(self, bits: np.ndarray, length: int):
+        self.bits = bits
+        self.length = length
+
+    @classmethod
+    def from_array(cls, values) -> 'PackedBools':
+        values = np.asarray(values, dtype=bool)
+        return cls(np.packbits(values), len(values))
+
+    def to_numpy(self) -> np.ndarray:
+        return np.unpackbits(self.bits, count=self.length).astype(bool)
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class CompactSignals:
+    """
+    精簡保存的信號表：浮點數欄位 float32、Signal int8、布林欄位打包為位元
+    以欄位名稱索引取得 numpy 陣列（布林欄位於存取時才展開），to_frame() 轉回 DataFrame
+    """
+
+    def __init__(self, columns: dict, index: pd.Index):
+        self.columns = columns
+        self.index = index
+
+    @classmethod
+    def from_frame(cls, signals: pd.DataFrame) -> 'CompactSignals':
+        columns = {}
+        for name, values in compact_columns({name: signals[name].to_numpy() for name in signals.columns}).items():
+            columns[name] = PackedBools.from_array(values) if values.dtype == bool else values
+        return cls(columns, signals.index)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        values = self.columns[name]
+        return values.to_numpy() if isinstance(values, PackedBools) else values
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: self[name] for name in self.columns}, index=self.index, copy=False)
+
+
+def _relative_error(reference: np.ndarray, values: np.ndarray) -> float:
+    """最大誤差除以參考值的最大絕對值（兩邊同為 NaN 的位置略過，只有一邊為 NaN 視為無限大）"""
+    reference = np.asarray(reference, dtype='float64')
+    values = np.asarray(values, dtype='float64')
+    both_nan = np.isnan(reference) & np.isnan(values)
+    if (np.isnan(reference) != np.isnan(values)).any():
+        return float('inf')
+    scale = np.abs(reference[~both_nan]).max(initial=0.0)
+    if scale == 0:
+        return 0.0
+    return float(np.abs(reference[~both_nan] - values[~both_nan]).max(initial=0.0) / scale)
+
+
+def verify(strategy_class, data: pd.DataFrame, tolerances: dict = None, **params) -> dict:
+    """
+    以 float64 與精簡模式各回測一次，檢查差異是否在容許範圍內
+    Args:
+        strategy_class: 策略類別
+        data: float64 的 OHLCV
+        tolerances: 覆寫 TOLERANCES 的部分項目
+        **params: 策略參數
+    Returns:
+        各項誤差（price_error、indicator_error、signal_mismatch、metric_error）、trades_identical、
+        以及 within_tolerance（全部項目都在容許範圍內）
+    """
+    limits = dict(TOLERANCES, **(tolerances or {}))
+    reference = strategy_class(data=data, **params)
+    compact = strategy_class(data=compact_ohlcv(data), **params)
+
+    price_error = max((_relative_error(data[name].to_numpy(), compact.data[name].to_numpy())
+                       for name in PRICE_COLUMNS if name in data.columns), default=0.0)
+
+    reference_signals = reference.run_stage('signals')
+    compact_signals = compact.run_stage('signals')
+    indicator_error = max((_relative_error(reference_signals[name].to_numpy(), compact_signals[name].to_numpy())
+                           for name in reference_signals.columns if name != 'Signal'), default=0.0)
+    mismatched = reference_signals['Signal'].to_numpy() != compact_signals['Signal'].to_numpy()
+    signal_mismatch = float(mismatched.mean()) if len(mismatched) else 0.0
+
+    reference_results = reference.backtest()
+    compact_results = compact.backtest()
+    reference_trades = reference_results['trades']
+    compact_trades = compact_results['trades']
+    trades_identical = (len(reference_trades) == len(compact_trades)
+                        and np.array_equal(reference_trades['entry_index'], compact_trades['entry_index'])
+                        and np.array_equal(reference_trades['exit_index'], compact_trades['exit_index']))
+    metric_error = np.nan
+    if trades_identical:
+        metric_error = max(abs(float(reference_results[name]) - float(compact_results[name]))
+                           for name in COMPARED_METRICS)
+
+    within_tolerance = bool(price_error <= limits['price']
+                            and indicator_error <= limits['indicator']
+                            and signal_mismatch <= limits['signal']
+                            and (not trades_identical or metric_error <= limits['metric']))
+    return {
+        'price_error': price_error,
+        'indicator_error': indicator_error,
+        'signal_mismatch': signal_mismatch,
+        'trades_identical': trades_identical,
+        'metric_error': metric_error,
+        'within_tolerance': within_tolerance,
+    }
@@ -0,0 +1,232 @@
+"""
+共用技術指標（True Range、ATR、移動平均、RSI、滾動極值、SuperTrend）
+
+所有指標依「資料集 + 參數」快取：同一份 DataFrame（例如由 FrameCache 共用的資料）
+在多個策略或多組參數間重複使用時，每個指標只計算一次。
+資料集與回傳的 Series 皆視為唯讀，請勿直接修改。
+
+*_multi 函式一次計算多組視窗（參數搜尋用），結果寫入同一個快取，
+之後單一參數的函式直接取用；與逐一計算的差異僅在浮點捨入（相對誤差約 1e-14 以下）。
+"""
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from . import kernels
+
+# 一天的奈秒數，time_index 的時間單位
+NS_PER_DAY = 86_400 * 10**9
+
+
+class IndicatorCache:
+    """以資料集物件為鍵的指標快取，資料集被回收時自動清除對應的結果"""
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, dataset_id: int):
+        with self._lock:
+            self._results.pop(dataset_id, None)
+
+    def get(self, df: pd.DataFrame, key: tuple):
+        """取得已快取的結果，沒有則回傳 None"""
+        with self._lock:
+            results = self._results.get(id(df))
+            if results is not None and key in results:
+                self.hits += 1
+                return results[key]
+        return None
+
+    def put(self, df: pd.DataFrame, key: tuple, value):
+        """寫入計算結果（批次計算的指標以此預先放入快取）"""
+        dataset_id = id(df)
+        with self._lock:
+            self.misses += 1
+            if dataset_id not in self._results:
+                self._results[dataset_id] = {}
+                weakref.finalize(df, self._drop, dataset_id)
+            self._results[dataset_id][key] = value
+
+    def contains(self, df: pd.DataFrame, key: tuple) -> bool:
+        with self._lock:
+            return key in self._results.get(id(df), {})
+
+    def get_or_compute(self, df: pd.DataFrame, key: tuple, compute):
+        value = self.get(df, key)
+        if value is None:
+            value = compute()
+            self.put(df, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'datasets': len(self._results),
+                'entries': sum(len(results) for results in self._results.values()),
+            }
+
+
+# 所有策略共用的指標快取
+indicator_cache = IndicatorCache()
+
+
+def true_range(df: pd.DataFrame) -> pd.Series:
+    """True Range = max(最高-最低, |最高-前收|, |最低-前收|)，第一根 K 棒為最高-最低"""
+    def compute():
+        prev_close = df['Close'].shift()
+        high_low = df['High'] - df['Low']
+        high_close = (df['High'] - prev_close).abs()
+        low_close = (df['Low'] - prev_close).abs()
+        return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    return indicator_cache.get_or_compute(df, ('true_range',), compute)
+
+
+def atr(df: pd.DataFrame, period: int, method: str = 'sma') -> pd.Series:
+    """ATR：True Range 的簡單移動平均（sma）或指數移動平均（ema，span=period）"""
+    def compute():
+        tr = true_range(df)
+        if method == 'sma':
+            return tr.rolling(window=period).mean()
+        if method == 'ema':
+            return tr.ewm(span=period, adjust=False).mean()
+        raise ValueError(f"未知的 ATR 計算方式: {method}")
+    return indicator_cache.get_or_compute(df, ('atr', period, method), compute)
+
+
+def atr_mean(df: pd.DataFrame, period: int, window: int, method: str = 'sma') -> pd.Series:
+    """ATR 的滾動平均"""
+    return indicator_cache.get_or_compute(
+        df, ('atr_mean', period, window, method),
+        lambda: atr(df, period, method).rolling(window=window).mean())
+
+
+def sma(df: pd.DataFrame, window: int, column: str = 'Close') -> pd.Series:
+    """簡單移動平均"""
+    return indicator_cache.get_or_compute(
+        df, ('sma', column, window), lambda: df[column].rolling(window=window).mean())
+
+
+def rolling_max(df: pd.DataFrame, window: int, column: str = 'High') -> pd.Series:
+    """滾動最大值"""
+    return indicator_cache.get_or_compute(
+        df, ('rolling_max', column, window), lambda: df[column].rolling(window=window).max())
+
+
+def rolling_min(df: pd.DataFrame, window: int, column: str = 'Low') -> pd.Series:
+    """滾動最小值"""
+    return indicator_cache.get_or_compute(
+        df, ('rolling_min', column, window), lambda: df[column].rolling(window=window).min())
+
+
+def time_index(df: pd.DataFrame):
+    """
+    以奈秒表示的整數時間索引，供出場引擎判斷持倉時間
+    (t_j - t_i) >= 天數 * NS_PER_DAY 與 Timestamp 相減後 .days >= 天數 等價
+    """
+    return indicator_cache.get_or_compute(
+        df, ('time_index',), lambda: pd.DatetimeIndex(df.index).as_unit('ns').asi8)
+
+
+def rsi(df: pd.DataFrame, period: int, column: str = 'Close') -> pd.Series:
+    """RSI：以漲跌幅的簡單移動平均計算"""
+    def compute():
+        delta = df[column].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+    return indicator_cache.get_or_compute(df, ('rsi', column, period), compute)
+
+
+def supertrend(df: pd.DataFrame, period: int, multiplier: float) -> pd.DataFrame:
+    """SuperTrend：回傳 ATR、SuperTrend 與 InUptrend 欄位"""
+    def compute():
+        atr_values = atr(df, period)
+        values, in_uptrend, _, _ = kernels.supertrend(
+            df['High'].to_numpy(dtype='float64'), df['Low'].to_numpy(dtype='float64'),
+            df['Close'].to_numpy(dtype='float64'), atr_values.to_numpy(), multiplier)
+        return pd.DataFrame({
+            'ATR': atr_values,
+            'SuperTrend': values,
+            'InUptrend': in_uptrend
+        }, index=df.index)
+    return indicator_cache.get_or_compute(df, ('supertrend', period, multiplier), compute)
+
+
+def _batched(df: pd.DataFrame, keys: list, compute_missing, name=None) -> np.ndarray:
+    """
+    取出多個指標組成 (n, k) 陣列；快取中沒有的以 compute_missing(缺少的位置) 一次算出
+    (n, m) 陣列，並逐欄以 Series 寫入快取
+    """
+    missing = [j for j, key in enumerate(keys) if not indicator_cache.contains(df, key)]
+    if missing:
+        values = compute_missing(missing)
+        for col, j in enumerate(missing):
+            indicator_cache.put(df, keys[j], pd.Series(values[:, col], index=df.index, name=name))
+    if not keys:
+        return np.empty((len(df), 0))
+    return np.column_stack([indicator_cache.get(df, key).to_numpy() for key in keys])
+
+
+def sma_multi(df: pd.DataFrame, windows, column: str = 'Close') -> np.ndarray:
+    """多個視窗的簡單移動平均，以前綴和一次算出，回傳 (n, 視窗數) 陣列"""
+    windows = [int(w) for w in windows]
+    return _batched(
+        df, [('sma', column, w) for w in windows],
+        lambda missing: kernels.rolling_mean_multi(
+            df[column].to_numpy(dtype='float64'), [windows[j] for j in missing]),
+        name=column)
+
+
+def atr_multi(df: pd.DataFrame, periods, method: str = 'sma') -> np.ndarray:
+    """多個週期的 ATR（sma 以前綴和、ema 以批次遞迴計算），回傳 (n, 週期數) 陣列"""
+    if method not in ('sma', 'ema'):
+        raise ValueError(f"未知的 ATR 計算方式: {method}")
+    periods = [int(p) for p in periods]
+
+    def compute(missing):
+        tr = true_range(df).to_numpy(dtype='float64')
+        selected = np.array([periods[j] for j in missing])
+        if method == 'sma':
+            return kernels.rolling_mean_multi(tr, selected)
+        # ewm(span=p) 的質心為 (p - 1) / 2
+        return kernels.ewm_mean_multi(tr, (selected - 1) / 2.0)
+
+    return _batched(df, [('atr', p, method) for p in periods], compute)
+
+
+def atr_mean_multi(df: pd.DataFrame, periods, windows, method: str = 'sma') -> np.ndarray:
+    """多組 (ATR 週期, 平均視窗) 的 ATR 滾動平均，回傳 (n, 組數) 陣列"""
+    pairs = [(int(p), int(w)) for p, w in zip(periods, windows)]
+
+    def compute(missing):
+        selected = [pairs[j] for j in missing]
+        atr_values = atr_multi(df, [p for p, _ in selected], method)
+        return kernels.rolling_mean_multi(atr_values, [w for _, w in selected])
+
+    return _batched(df, [('atr_mean', p, w, method) for p, w in pairs], compute)
+
+
+def rsi_multi(df: pd.DataFrame, periods, column: str = 'Close') -> np.ndarray:
+    """多個週期的 RSI（漲跌幅的簡單移動平均一次算出），回傳 (n, 週期數) 陣列"""
+    periods = [int(p) for p in periods]
+
+    def compute(missing):
+        delta = df[column].diff().to_numpy(dtype='float64')
+        selected = [periods[j] for j in missing]
+        # 與 rsi() 相同：第一根的 NaN 漲跌幅視為 0
+        gain = kernels.rolling_mean_multi(np.where(delta > 0, delta, 0.0), selected)
+        loss = kernels.rolling_mean_multi(np.where(delta < 0, -delta, 0.0), selected)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 100 - (100 / (1 + gain / loss))
+
+    return _batched(df, [('rsi', column, p) for p in periods], compute, name=column)
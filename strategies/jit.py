@@ -0,0 +1,209 @@
+"""
+路徑相依迴圈的選用 JIT 後端
+安裝 numba 時可將 SuperTrend 棘輪、出場引擎、首次進場搜尋與批次 EMA 遞迴編譯為機器碼；
+未安裝或選擇 numpy 後端時，kernels 自動改用純 numpy 實作，結果相同
+
+後端可用 set_backend() 或環境變數 ATR_JIT_BACKEND（auto、numba、numpy）選擇，
+預設 auto：有 numba 就使用。第一次呼叫時才編譯，互動介面可先在背景呼叫 warmup()
+"""
+import itertools
+import os
+import threading
+import time
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ('auto', 'numba', 'numpy')
+
+_backend = None
+_compiled = {}
+_lock = threading.Lock()
+
+
+def _supertrend_loop(close, upper, lower, trend, result):
+    """SuperTrend 上下軌棘輪，直接修改 upper、lower、trend、result"""
+    n = close.shape[0]
+    for i in range(1, n):
+        if close[i] > upper[i - 1]:
+            up = True
+        elif close[i] < lower[i - 1]:
+            up = False
+        else:
+            up = trend[i - 1]
+            if up and lower[i] < lower[i - 1]:
+                lower[i] = lower[i - 1]
+            if (not up) and upper[i] > upper[i - 1]:
+                upper[i] = upper[i - 1]
+        trend[i] = up
+        if up:
+            result[i] = lower[i]
+        else:
+            result[i] = upper[i]
+
+
+def _exit_loop(signal, close, times, stop, target, trail, max_hold, use_time, start,
+               entries, exits, reasons):
+    """
+    出場引擎的逐根迴圈，語意與 kernels.exit_trades 相同
+    不使用的價位以 NaN 表示；出場原因代碼依 kernels.EXIT_REASONS 順序，-1 表示未平倉
+    Returns:
+        交易筆數（entries、exits、reasons 的前幾筆有效）
+    """
+    n = close.shape[0]
+    count = 0
+    i = start
+    while i < n:
+        if signal[i] != 1:
+            i += 1
+            continue
+        entries[count] = i
+        if i == n - 1:
+            exits[count] = -1
+            reasons[count] = -1
+            count += 1
+            break
+
+        peak = close[i]
+        exit_at = n - 1
+        reason = -1
+        for j in range(i + 1, n):
+            price = close[j]
+            if price < stop[i]:
+                reason = 0
+            elif price < peak - trail[i]:
+                reason = 1
+            elif price > target[i]:
+                reason = 2
+            elif use_time and times[j] - times[i] >= max_hold:
+                reason = 3
+            elif j == n - 1:
+                reason = 4
+            if reason >= 0:
+                exit_at = j
+                break
+            if price > peak:
+                peak = price
+
+        exits[count] = exit_at
+        reasons[count] = reason
+        count += 1
+        i = exit_at + 1
+    return count
+
+
+def _first_entry_loop(signal):
+    """第一個進場信號的位置，沒有則回傳 -1"""
+    for i in range(signal.shape[0]):
+        if signal[i] == 1:
+            return i
+    return -1
+
+
+def _ewm_mean_loop(values, alphas, out):
+    """
+    多個平滑係數的 EMA（adjust=False），沒有缺值時逐步更新規則與 pandas 相同
+    （只處理開頭以外沒有缺值的輸入，中間有缺值時 kernels.ewm_mean_multi 改用 pandas）
+    """
+    n = values.shape[0]
+    k = alphas.shape[0]
+    for j in range(k):
+        alpha = alphas[j]
+        old_wt_factor = 1.0 - alpha
+        weighted = values[0] if n > 0 else np.nan
+        old_wt = 1.0
+        for i in range(n):
+            if i > 0:
+                cur = values[i]
+                is_observation = cur == cur
+                if weighted == weighted:
+                    old_wt *= old_wt_factor
+                    if is_observation and weighted != cur:
+                        weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                        old_wt = 1.0
+                    elif is_observation:
+                        old_wt = 1.0
+                elif is_observation:
+                    weighted = cur
+            out[i, j] = weighted
+
+
+_LOOPS = {
+    'supertrend': _supertrend_loop,
+    'exit_trades': _exit_loop,
+    'first_entry': _first_entry_loop,
+    'ewm_mean': _ewm_mean_loop,
+}
+
+
+def available() -> bool:
+    """是否已安裝 numba"""
+    return numba is not None
+
+
+def set_backend(name: str):
+    """設定 JIT 後端：auto（預設，有 numba 就使用）、numba 或 numpy"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 JIT 後端: {name}，可用: {', '.join(BACKENDS)}")
+    if name == 'numba' and not available():
+        raise ValueError("未安裝 numba，無法使用 numba 後端")
+    if name == 'auto':
+        name = 'numba' if available() else 'numpy'
+    _backend = name
+
+
+def get_backend() -> str:
+    """目前使用的後端（numba 或 numpy）"""
+    if _backend is None:
+        requested = os.environ.get('ATR_JIT_BACKEND', 'auto')
+        # 環境變數無效或要求 numba 但未安裝時退回 numpy，不中斷回測（只在第一次決定後端時提示）
+        if requested not in BACKENDS:
+            print(f"未知的 JIT 後端: ATR_JIT_BACKEND={requested}，改用 numpy（可用: {', '.join(BACKENDS)}）")
+            requested = 'numpy'
+        set_backend('auto' if requested == 'numba' and not available() else requested)
+    return _backend
+
+
+def get_kernel(name: str):
+    """取得編譯後的迴圈，numpy 後端時回傳 None（呼叫端改用 numpy 實作）"""
+    if get_backend() != 'numba':
+        return None
+    kernel = _compiled.get(name)
+    if kernel is None:
+        with _lock:
+            kernel = _compiled.get(name)
+            if kernel is None:
+                kernel = numba.njit(cache=True, nogil=True)(_LOOPS[name])
+                _compiled[name] = kernel
+    return kernel
+
+
+def warmup() -> float:
+    """
+    預先編譯所有迴圈（numba 後端才有作用），回傳花費秒數
+    GUI 可在背景執行緒呼叫，避免第一次回測時等待編譯
+    """
+    started = time.perf_counter()
+    if get_backend() != 'numba':
+        return 0.0
+
+    nan = np.full(8, np.nan)
+    times = np.arange(8, dtype='int64')
+    # 回測資料可能是唯讀視圖（共享記憶體、快取的信號表），可寫與唯讀兩種型別都先編譯；
+    # 信號一般為 int64，精簡模式（strategies.compact）為 int8
+    for writeable, signal_dtype in itertools.product((True, False), ('int64', 'int8')):
+        close = np.linspace(1.0, 2.0, 8)
+        signal = np.zeros(8, dtype=signal_dtype)
+        signal[1] = 1
+        close.flags.writeable = signal.flags.writeable = writeable
+        get_kernel('supertrend')(close, close + 1.0, close - 1.0, np.ones(8, dtype=bool), nan.copy())
+        get_kernel('exit_trades')(signal, close, times, nan, nan, nan, 3, True, 0,
+                                  np.empty(8, dtype='int64'), np.empty(8, dtype='int64'),
+                                  np.empty(8, dtype='int8'))
+        get_kernel('first_entry')(signal)
+        get_kernel('ewm_mean')(close, np.array([0.5]), np.empty((8, 1)))
+    return time.perf_counter() - started
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseStrategy
+from . import indicators, kernels
+from .trade_table import HOLDING, TradeTable, trade_returns
 
 class MAHoldStrategy(BaseStrategy):
     """
@@ -8,8 +10,9 @@ class MAHoldStrategy(BaseStrategy):
     在黃金交叉時買入，但不會在死亡交叉時賣出，而是持續持有
     """
     
-    def __init__(self, ticker: str, start_date: str, short_period: int = 5, long_period: int = 20):
-        super().__init__(ticker, start_date)
+    def __init__(self, ticker: str = None, start_date: str = None, short_period: int = 5, long_period: int = 20,
+                 data: pd.DataFrame = None):
+        super().__init__(ticker, start_date, data)
         self.short_period = short_period
         self.long_period = long_period
     
@@ -22,77 +25,74 @@ class MAHoldStrategy(BaseStrategy):
             'long_period': self.long_period
         }
     
-    def generate_signals(self) -> pd.DataFrame:
-        df = self.data.copy()
-        
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        strategies = [cls(data=data, **params) for params in param_sets]
+        windows = {s.short_period for s in strategies} | {s.long_period for s in strategies}
+        indicators.sma_multi(data, sorted(windows))
+    
+    def compute_indicators(self) -> dict:
         # 計算短期和長期移動平均線
-        df['Fast_MA'] = df['Close'].rolling(window=self.short_period).mean()
-        df['Slow_MA'] = df['Close'].rolling(window=self.long_period).mean()
+        return {
+            'Fast_MA': indicators.sma(self.data, self.short_period),
+            'Slow_MA': indicators.sma(self.data, self.long_period),
+        }
+    
+    def generate_signals(self) -> pd.DataFrame:
+        return self.run_stage('signals').copy(deep=False)
+    
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        fast = indicator_values['Fast_MA'].to_numpy()
+        slow = indicator_values['Slow_MA'].to_numpy()
+        prev_fast = kernels.previous(fast)
+        prev_slow = kernels.previous(slow)
         
         # 生成信號 - 只生成買入信號，不生成賣出信號
-        df['Signal'] = 0
+        signal = np.zeros(len(fast), dtype='int64')
         # 黃金交叉：短期均線向上穿越長期均線時買入
-        df.loc[(df['Fast_MA'] > df['Slow_MA']) & 
-               (df['Fast_MA'].shift(1) <= df['Slow_MA'].shift(1)), 'Signal'] = 1
+        signal[(fast > slow) & (prev_fast <= prev_slow)] = 1
         # 注意：不設置死亡交叉的賣出信號(-1)，實現持倉不賣出
         
-        return df
+        return self.signal_frame(indicator_values, signal)
     
-    def backtest(self) -> dict:
-        """執行回測 - 重寫以支持持倉不賣出邏輯"""
-        if self.data is None:
-            raise ValueError("沒有數據可供回測")
-            
-        signals = self.generate_signals()
-        trades = []
-        position = 0
-        entry_price = 0
-        entry_date = None
-        
-        for i in range(len(signals)):
-            current_signal = signals['Signal'].iloc[i]
-            current_price = signals['Close'].iloc[i]
-            current_date = signals.index[i]
-            
-            # 只在沒有持倉時開倉
-            if position == 0 and current_signal == 1:
-                position = 1
-                entry_price = current_price
-                entry_date = current_date
-                print(f"買入信號: {current_date.strftime('%Y-%m-%d')}, 價格: {current_price:.2f}")
-        
-        # 如果最後還有持倉，記錄為未平倉交易
-        if position == 1:
-            trades.append({
-                'entry_date': entry_date,
-                'entry_price': entry_price,
-                'exit_date': None,  # 未平倉
-                'exit_price': signals['Close'].iloc[-1],  # 當前價格
-                'exit_reason': '持倉中',
-                'return': (signals['Close'].iloc[-1] - entry_price) / entry_price
-            })
-            print(f"持倉中: 買入日期 {entry_date.strftime('%Y-%m-%d')}, 買入價格: {entry_price:.2f}, 當前價格: {signals['Close'].iloc[-1]:.2f}")
-        
-        # 計算報酬率用於夏普比率計算
-        returns = []
-        for trade in trades:
-            if 'return' in trade and trade['return'] is not None:
-                returns.append(trade['return'])
+    def compute_trades(self, signals: pd.DataFrame) -> TradeTable:
+        """只在沒有持倉時開倉，且從不賣出，因此只有第一個買入信號有效；持倉以當前價格計算報酬"""
+        close = self.data['Close'].to_numpy()
+        first = kernels.first_entry(signals['Signal'].to_numpy())
+        entries = [first] if first >= 0 else []
+        trades = TradeTable.from_arrays(signals.index, close, entries, [kernels.OPEN] * len(entries), HOLDING)
+        trades.mark_open(close[-1])
+        return trades
+    
+    def compute_metrics(self, signals: pd.DataFrame, trades: TradeTable) -> dict:
+        position = 1 if len(trades) else 0
+        entry_price = trades['entry_price'][0] if position else 0
+        entry_date = trades.entry_dates[0] if position else None
+        current_price = self.data['Close'].iloc[-1]
         
-        # 計算績效指標
-        performance = {
+        # 計算績效指標（持倉期間的每日權益曲線，未平倉交易持有到最後一根）
+        performance = self.calculate_performance(self.data['Close'], trades)
+        performance.update({
             'total_return': self.calculate_total_return_from_trades(trades),
-            'sharpe_ratio': self.calculate_sharpe_ratio(returns),
-            'max_drawdown': self.calculate_drawdown(returns),
             'win_rate': self.calculate_win_rate(trades),
             'current_position': position,
             'entry_date': entry_date.strftime('%Y-%m-%d') if entry_date else None,
             'entry_price': entry_price if entry_price else 0,
-            'current_price': signals['Close'].iloc[-1],
-            'unrealized_return': (signals['Close'].iloc[-1] - entry_price) / entry_price if entry_price else 0,
+            'current_price': current_price,
+            'unrealized_return': (current_price - entry_price) / entry_price if entry_price else 0,
             'num_trades': len(trades),
             'trades': trades
-        }
+        })
+        
+        return performance
+    
+    def backtest(self) -> dict:
+        """執行回測 - 持倉不賣出，另外輸出買入信號與持倉狀態"""
+        performance = super().backtest()
+        if performance['current_position'] == 1:
+            entry_price = performance['entry_price']
+            print(f"買入信號: {performance['entry_date']}, 價格: {entry_price:.2f}")
+            print(f"持倉中: 買入日期 {performance['entry_date']}, 買入價格: {entry_price:.2f}, 當前價格: {performance['current_price']:.2f}")
         
         return performance
     
@@ -102,8 +102,9 @@ class MAHoldStrategy(BaseStrategy):
             return 0
         
         # 對於持倉不賣出策略，通常只有一筆交易
-        if len(trades) == 1 and trades[0].get('return') is not None:
-            return trades[0]['return']
+        returns = trade_returns(trades)
+        if len(trades) == 1 and len(returns) == 1:
+            return returns[0]
         
         return 0
     
@@ -113,22 +114,13 @@ class MAHoldStrategy(BaseStrategy):
             return None
             
         signals = self.generate_signals()
-        position = 0
-        entry_price = 0
-        entry_date = None
-        
-        for i in range(len(signals)):
-            current_signal = signals['Signal'].iloc[i]
-            current_price = signals['Close'].iloc[i]
-            current_date = signals.index[i]
-            
-            if position == 0 and current_signal == 1:
-                position = 1
-                entry_price = current_price
-                entry_date = current_date
+        first = kernels.first_entry(signals['Signal'].to_numpy())
         
-        if position == 1:
-            current_price = signals['Close'].iloc[-1]
+        if first >= 0:
+            close = self.data['Close']
+            entry_price = close.iloc[first]
+            entry_date = close.index[first]
+            current_price = close.iloc[-1]
             unrealized_return = (current_price - entry_price) / entry_price
             return {
                 'is_holding': True,
@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseStrategy
+from . import indicators, kernels
 
 class MAStrategy(BaseStrategy):
-    def __init__(self, ticker: str, start_date: str, short_period: int = 5, long_period: int = 20):
-        super().__init__(ticker, start_date)
+    def __init__(self, ticker: str = None, start_date: str = None, short_period: int = 5, long_period: int = 20,
+                 data: pd.DataFrame = None):
+        super().__init__(ticker, start_date, data)
         self.short_period = short_period
         self.long_period = long_period
     
@@ -17,20 +19,33 @@ class MAStrategy(BaseStrategy):
             'long_period': self.long_period
         }
     
-    def generate_signals(self) -> pd.DataFrame:
-        df = self.data.copy()
-        
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        strategies = [cls(data=data, **params) for params in param_sets]
+        windows = {s.short_period for s in strategies} | {s.long_period for s in strategies}
+        indicators.sma_multi(data, sorted(windows))
+    
+    def compute_indicators(self) -> dict:
         # 計算短期和長期移動平均線
-        df['Fast_MA'] = df['Close'].rolling(window=self.short_period).mean()
-        df['Slow_MA'] = df['Close'].rolling(window=self.long_period).mean()
+        return {
+            'Fast_MA': indicators.sma(self.data, self.short_period),
+            'Slow_MA': indicators.sma(self.data, self.long_period),
+        }
+    
+    def generate_signals(self) -> pd.DataFrame:
+        return self.run_stage('signals').copy(deep=False)
+    
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        fast = indicator_values['Fast_MA'].to_numpy()
+        slow = indicator_values['Slow_MA'].to_numpy()
+        prev_fast = kernels.previous(fast)
+        prev_slow = kernels.previous(slow)
         
         # 生成信號
-        df['Signal'] = 0
+        signal = np.zeros(len(fast), dtype='int64')
         # 黃金交叉：短期均線向上穿越長期均線
-        df.loc[(df['Fast_MA'] > df['Slow_MA']) & 
-               (df['Fast_MA'].shift(1) <= df['Slow_MA'].shift(1)), 'Signal'] = 1
+        signal[(fast > slow) & (prev_fast <= prev_slow)] = 1
         # 死亡交叉：短期均線向下穿越長期均線
-        df.loc[(df['Fast_MA'] < df['Slow_MA']) & 
-               (df['Fast_MA'].shift(1) >= df['Slow_MA'].shift(1)), 'Signal'] = -1
+        signal[(fast < slow) & (prev_fast >= prev_slow)] = -1
         
-        return df 
\ No newline at end of file
+        return self.signal_frame(indicator_values, signal) 
\ No newline at end of file
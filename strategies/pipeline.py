@@ -0,0 +1,167 @@
+"""
+回測的階段管線：data → indicators → signals → trades → metrics
+每個階段的結果依「資料集 + 該階段與上游階段的參數」快取，參數改變時只重新計算受影響的階段與其下游，
+例如 ATR 策略只改 max_hold_days 時直接沿用已算好的指標與信號，只重新產生交易與績效
+
+策略以 STAGE_PARAMETERS 宣告每個參數屬於哪個階段，未宣告的參數視為影響 indicators（整條管線重算）
+快取的結果由多組參數共用，請勿直接修改
+"""
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+STAGES = ('indicators', 'signals', 'trades', 'metrics')
+
+# 各階段的輸入階段（data 為策略本身的資料，不列出）
+DEPENDS = {
+    'indicators': (),
+    'signals': ('indicators',),
+    'trades': ('signals',),
+    'metrics': ('signals', 'trades'),
+}
+
+# 預設記憶體上限 256 MB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def ancestors(stage: str) -> list:
+    """階段本身與所有上游階段"""
+    result = [stage]
+    for parent in DEPENDS[stage]:
+        result.extend(s for s in ancestors(parent) if s not in result)
+    return result
+
+
+def value_nbytes(value) -> int:
+    """估計階段結果佔用的記憶體大小"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    return int(getattr(value, 'nbytes', 0))
+
+
+def stage_parameters(strategy, stage: str) -> dict:
+    """屬於指定階段的參數（依策略的 STAGE_PARAMETERS，未宣告者屬於 indicators）"""
+    assigned = {name: owner for owner, names in strategy.STAGE_PARAMETERS.items() for name in names}
+    unknown = set(assigned.values()) - set(STAGES)
+    if unknown:
+        raise ValueError(f"未知的階段: {', '.join(sorted(unknown))}，可用: {', '.join(STAGES)}")
+    return {name: value for name, value in strategy.get_parameters().items()
+            if assigned.get(name, 'indicators') == stage}
+
+
+def stage_key(strategy, stage: str) -> tuple:
+    """階段結果的快取鍵：策略類別、階段名稱與該階段及上游階段的參數"""
+    params = {}
+    for upstream in ancestors(stage):
+        params.update(stage_parameters(strategy, upstream))
+    return (type(strategy), stage, tuple(sorted((name, repr(value)) for name, value in params.items())))
+
+
+class StageCache:
+    """
+    以資料集物件為鍵的階段結果快取（LRU，以記憶體用量為上限）
+    資料集被回收時自動清除對應的結果
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._datasets = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 各階段實際計算的次數
+        self.computed = {stage: 0 for stage in STAGES}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _drop(self, dataset_id: int):
+        with self._lock:
+            self._datasets.discard(dataset_id)
+            for key in [key for key in self._entries if key[0] == dataset_id]:
+                del self._entries[key]
+                del self._sizes[key]
+
+    def get(self, df: pd.DataFrame, key: tuple):
+        with self._lock:
+            value = self._entries.get((id(df),) + key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((id(df),) + key)
+            self.hits += 1
+            return value
+
+    def put(self, df: pd.DataFrame, key: tuple, value):
+        size = value_nbytes(value)
+        dataset_id = id(df)
+        full_key = (dataset_id,) + key
+        with self._lock:
+            if dataset_id not in self._datasets:
+                self._datasets.add(dataset_id)
+                weakref.finalize(df, self._drop, dataset_id)
+            if full_key in self._entries:
+                del self._entries[full_key]
+                del self._sizes[full_key]
+            # 單一結果超過上限時不快取
+            if size > self.max_bytes:
+                return
+            self._entries[full_key] = value
+            self._sizes[full_key] = size
+            while self.nbytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                del self._sizes[old_key]
+                self.evictions += 1
+
+    def count(self, stage: str):
+        """記錄階段實際計算一次"""
+        with self._lock:
+            self.computed[stage] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'computed': dict(self.computed),
+            }
+
+
+# 所有策略共用的階段快取
+stage_cache = StageCache()
+
+
+def run(strategy, stage: str):
+    """取得策略某個階段的結果：命中快取時直接回傳，否則先取得輸入階段再計算並寫入快取"""
+    if stage not in DEPENDS:
+        raise ValueError(f"未知的階段: {stage}，可用: {', '.join(STAGES)}")
+    data = strategy.data
+    key = stage_key(strategy, stage)
+    value = stage_cache.get(data, key)
+    if value is None:
+        inputs = [run(strategy, upstream) for upstream in DEPENDS[stage]]
+        value = getattr(strategy, f'compute_{stage}')(*inputs)
+        stage_cache.count(stage)
+        stage_cache.put(data, key, value)
+    return value
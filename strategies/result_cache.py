@@ -0,0 +1,178 @@
+"""
+回測結果的磁碟快取：以資料指紋、策略類別與版本、策略參數的雜湊為鍵，重複回測同一組設定時直接讀取結果
+資料指紋涵蓋整段 OHLCV（含索引），資料尾端更新後鍵值隨之改變，舊結果不再命中並由容量上限淘汰
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from market_data.locking import FileLock
+from market_data.store import CACHE_DIR, atomic_write
+
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, 'results')
+
+# 預設磁碟用量上限 512 MB
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 快取檔案格式版本，結果的結構改變時遞增
+FORMAT_VERSION = 2
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """OHLCV 資料的指紋：索引與各欄位的原始位元組（數值欄位）或 pandas 雜湊（其他欄位）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+    if isinstance(df.index, pd.DatetimeIndex):
+        digest.update(np.ascontiguousarray(df.index.asi8).tobytes())
+    else:
+        digest.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind in 'biuf':
+            digest.update(values.dtype.str.encode('ascii'))
+            digest.update(np.ascontiguousarray(values).tobytes())
+        else:
+            digest.update(pd.util.hash_pandas_object(df[column], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def strategy_versions(strategy_class) -> list:
+    """策略類別與其父類別各自宣告的 VERSION（任何一層遞增都會使快取失效）"""
+    return [f"{klass.__qualname__}={klass.__dict__['VERSION']}"
+            for klass in strategy_class.__mro__ if 'VERSION' in klass.__dict__]
+
+
+class ResultCache:
+    """
+    以 pickle 檔保存回測結果，依最後存取時間淘汰超過容量上限的檔案
+    多個行程（GUI 與命令列）可共用同一個目錄：寫入為原子操作，淘汰時持有目錄鎖
+    """
+
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, strategy) -> str:
+        """策略實例（資料已載入）對應的快取鍵"""
+        strategy_class = type(strategy)
+        payload = {
+            'format': FORMAT_VERSION,
+            'strategy': f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+            'versions': strategy_versions(strategy_class),
+            'params': strategy.get_parameters(),
+            'data': data_fingerprint(strategy.data),
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get(self, key: str):
+        """讀取快取結果，沒有或無法讀取時回傳 None"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                results = pickle.load(f)
+        except FileNotFoundError:
+            results = None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"結果快取無法讀取，將重新回測: {path} ({str(e)})")
+            self._remove(path)
+            results = None
+
+        with self._lock:
+            if results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # 更新存取時間，淘汰時保留最近使用的結果
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return results
+
+    def put(self, key: str, results: dict):
+        content = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        # 單一結果超過上限時不快取
+        if len(content) > self.max_bytes:
+            return
+
+        def writer(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+        atomic_write(self.path(key), writer)
+        self._evict()
+
+    def backtest(self, strategy) -> dict:
+        """回傳策略的回測結果：命中快取時直接讀取，否則執行 backtest() 並寫入快取"""
+        if not self.enabled or strategy.data is None:
+            return strategy.backtest()
+        key = self.key(strategy)
+        results = self.get(key)
+        if results is None:
+            results = strategy.backtest()
+            self.put(key, results)
+        return results
+
+    def _entries(self) -> list:
+        """快取檔案的 (最後存取時間, 大小, 路徑)"""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """刪除最久未使用的檔案直到總大小不超過上限"""
+        with FileLock(os.path.join(self.root, '.lock')):
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @property
+    def nbytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+        entries = self._entries()
+        return dict(counters, entries=len(entries), bytes=sum(size for _, size, _ in entries),
+                    max_bytes=self.max_bytes)
+
+
+# GUI 與命令列共用的結果快取
+result_cache = ResultCache()
@@ -1,11 +1,18 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseStrategy
+from . import indicators, kernels
 
 class RSIStrategy(BaseStrategy):
-    def __init__(self, ticker: str, start_date: str, period: int = 14, 
-                 oversold: int = 30, overbought: int = 70):
-        super().__init__(ticker, start_date)
+    # 超買超賣閾值只影響信號，改變時沿用已算好的 RSI
+    STAGE_PARAMETERS = {
+        'indicators': ('period',),
+        'signals': ('oversold', 'overbought'),
+    }
+
+    def __init__(self, ticker: str = None, start_date: str = None, period: int = 14, 
+                 oversold: int = 30, overbought: int = 70, data: pd.DataFrame = None):
+        super().__init__(ticker, start_date, data)
         self.period = period
         self.oversold = oversold
         self.overbought = overbought
@@ -20,27 +27,27 @@ class RSIStrategy(BaseStrategy):
             'overbought': self.overbought
         }
     
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        periods = {cls(data=data, **params).period for params in param_sets}
+        indicators.rsi_multi(data, sorted(periods))
+    
+    def compute_indicators(self) -> dict:
+        # 計算 RSI（共用指標快取）
+        return {'RSI': indicators.rsi(self.data, self.period)}
+    
     def generate_signals(self) -> pd.DataFrame:
-        df = self.data.copy()
-        
-        # 計算價格變化
-        delta = df['Close'].diff()
-        
-        # 分別計算上漲和下跌
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.period).mean()
-        
-        # 計算 RS 和 RSI
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        return self.run_stage('signals').copy(deep=False)
+    
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        rsi = indicator_values['RSI'].to_numpy()
+        prev = kernels.previous(rsi)
         
         # 生成信號
-        df['Signal'] = 0
+        signal = np.zeros(len(rsi), dtype='int64')
         # 超賣反彈
-        df.loc[(df['RSI'] < self.oversold) & 
-               (df['RSI'].shift(1) < self.oversold), 'Signal'] = 1
+        signal[(rsi < self.oversold) & (prev < self.oversold)] = 1
         # 超買回落
-        df.loc[(df['RSI'] > self.overbought) & 
-               (df['RSI'].shift(1) > self.overbought), 'Signal'] = -1
+        signal[(rsi > self.overbought) & (prev > self.overbought)] = -1
         
-        return df 
\ No newline at end of file
+        return self.signal_frame(indicator_values, signal) 
\ No newline at end of file
@@ -1,12 +1,13 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseStrategy
+from . import indicators, kernels
 
 
 class SuperTrendStrategy(BaseStrategy):
-    def __init__(self, ticker: str, start_date: str,
-                 period: int = 10, multiplier: float = 3.0):
-        super().__init__(ticker, start_date)
+    def __init__(self, ticker: str = None, start_date: str = None,
+                 period: int = 10, multiplier: float = 3.0, data: pd.DataFrame = None):
+        super().__init__(ticker, start_date, data)
         self.period = period
         self.multiplier = multiplier
 
@@ -19,57 +20,33 @@ class SuperTrendStrategy(BaseStrategy):
             'multiplier': self.multiplier,
         }
 
+    @classmethod
+    def prime_indicators(cls, data: pd.DataFrame, param_sets: list):
+        periods = {cls(data=data, **params).period for params in param_sets}
+        indicators.atr_multi(data, sorted(periods))
+    
     def _calculate_tr(self, df: pd.DataFrame) -> pd.Series:
-        high_low = df['High'] - df['Low']
-        high_close = (df['High'] - df['Close'].shift()).abs()
-        low_close = (df['Low'] - df['Close'].shift()).abs()
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        return tr
+        return indicators.true_range(df)
 
     def _calculate_supertrend(self, df: pd.DataFrame) -> pd.DataFrame:
-        tr = self._calculate_tr(df)
-        atr = tr.rolling(window=self.period).mean()
+        # 上下軌棘輪由 numpy 陣列核心計算，結果依資料集與參數快取
+        return indicators.supertrend(df, self.period, self.multiplier)
 
-        hl2 = (df['High'] + df['Low']) / 2.0
-        upperband = hl2 + (self.multiplier * atr)
-        lowerband = hl2 - (self.multiplier * atr)
-
-        supertrend = pd.Series(index=df.index, dtype=float)
-        in_uptrend = pd.Series(index=df.index, dtype=bool)
-
-        supertrend.iloc[0] = np.nan
-        in_uptrend.iloc[0] = True
-
-        for i in range(1, len(df)):
-            if df['Close'].iloc[i] > upperband.iloc[i - 1]:
-                in_uptrend.iloc[i] = True
-            elif df['Close'].iloc[i] < lowerband.iloc[i - 1]:
-                in_uptrend.iloc[i] = False
-            else:
-                in_uptrend.iloc[i] = in_uptrend.iloc[i - 1]
-                if in_uptrend.iloc[i] and lowerband.iloc[i] < lowerband.iloc[i - 1]:
-                    lowerband.iloc[i] = lowerband.iloc[i - 1]
-                if (not in_uptrend.iloc[i]) and upperband.iloc[i] > upperband.iloc[i - 1]:
-                    upperband.iloc[i] = upperband.iloc[i - 1]
-
-            supertrend.iloc[i] = lowerband.iloc[i] if in_uptrend.iloc[i] else upperband.iloc[i]
-
-        result = pd.DataFrame({
-            'ATR': atr,
-            'SuperTrend': supertrend,
-            'InUptrend': in_uptrend
-        }, index=df.index)
-        return result
+    def compute_indicators(self) -> dict:
+        return dict(self._calculate_supertrend(self.data).items())
 
     def generate_signals(self) -> pd.DataFrame:
-        df = self.data.copy()
-        st = self._calculate_supertrend(df)
-        df = df.join(st)
+        return self.run_stage('signals').copy(deep=False)
+
+    def compute_signals(self, indicator_values: dict) -> pd.DataFrame:
+        uptrend = indicator_values['InUptrend'].to_numpy(dtype=bool)
+        prev = kernels.previous(uptrend)
 
-        df['Signal'] = 0
-        df.loc[(df['InUptrend'] == True) & (df['InUptrend'].shift(1) == False), 'Signal'] = 1
-        df.loc[(df['InUptrend'] == False) & (df['InUptrend'].shift(1) == True), 'Signal'] = -1
+        # 趨勢由空翻多買進、由多翻空賣出
+        signal = np.zeros(len(uptrend), dtype='int64')
+        signal[uptrend & (prev == 0)] = 1
+        signal[~uptrend & (prev == 1)] = -1
 
-        return df
+        return self.signal_frame(indicator_values, signal)
 
 
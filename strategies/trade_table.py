@@ -0,0 +1,266 @@
+"""
+欄式交易紀錄：以 numpy 結構化陣列保存每筆交易的進出場位置、價格、報酬與出場原因代碼，
+日期由回測資料的索引依位置取得，不逐筆保存
+績效以整欄陣列運算；逐筆迭代或以整數索引時產生與舊版相同鍵值的 dict，既有呼叫端不需修改
+"""
+import numpy as np
+import pandas as pd
+from . import kernels
+
+# 出場原因代碼：出場引擎的代碼（kernels.EXIT_REASONS）之後接信號反轉與持倉中；
+# 每個 TradeTable 保存自己的代碼表（reasons），from_records 遇到未知的原因名稱時附加在該表之後，
+# 代碼的意義不依賴行程內的呼叫順序，可安全地 pickle 或跨行程傳遞
+REASONS = tuple(kernels.EXIT_REASONS) + ('信號反轉', '持倉中')
+SIGNAL_REVERSAL = len(kernels.EXIT_REASONS)
+HOLDING = SIGNAL_REVERSAL + 1
+# 沒有出場原因（未平倉），與出場引擎的 OPEN 相同
+NO_REASON = kernels.OPEN
+
+# 每筆交易 57 bytes；未平倉交易的 exit_index 為 OPEN，沒有的價位與報酬為 NaN
+DTYPE = np.dtype([
+    ('entry_index', 'int64'),
+    ('exit_index', 'int64'),
+    ('entry_price', 'float64'),
+    ('exit_price', 'float64'),
+    ('return', 'float64'),
+    ('stop_loss', 'float64'),
+    ('take_profit', 'float64'),
+    ('reason', 'int8'),
+])
+
+# 逐筆 dict 中可選的價位欄位
+LEVELS = ('stop_loss', 'take_profit')
+
+# reason 欄位為 int8，一個代碼表最多可容納的原因種類
+MAX_REASONS = np.iinfo('int8').max + 1
+
+
+def reason_code(name, reasons: list) -> int:
+    """出場原因名稱在代碼表 reasons 中的代碼（未知的名稱附加在後），None 為 NO_REASON"""
+    if name is None:
+        return NO_REASON
+    if name not in reasons:
+        if len(reasons) >= MAX_REASONS:
+            raise ValueError(f"出場原因種類超過 {MAX_REASONS} 種")
+        reasons.append(name)
+    return reasons.index(name)
+
+
+class TradeTable:
+    """
+    一次回測的交易紀錄
+    - len()、迭代與整數索引與 list of dict 相同（dict 於存取時才產生）
+    - 以欄位名稱索引回傳整欄陣列，例如 trades['return']
+    - 以切片、布林或整數陣列索引回傳新的 TradeTable
+    """
+
+    def __init__(self, records: np.ndarray, index: pd.Index, levels=(), reasons: tuple = REASONS):
+        self.records = records
+        self.index = index
+        # 有提供的價位欄位（只有這些欄位會出現在逐筆 dict 中）
+        self.levels = tuple(name for name in LEVELS if name in levels)
+        # reason 欄位代碼對應的出場原因名稱
+        self.reasons = tuple(reasons)
+
+    @classmethod
+    def from_arrays(cls, index: pd.Index, close: np.ndarray, entries: np.ndarray, exits: np.ndarray,
+                    reasons=None, stop_loss: np.ndarray = None, take_profit: np.ndarray = None,
+                    keep_open: bool = True) -> 'TradeTable':
+        """
+        由進出場位置建立交易紀錄，已平倉的交易以收盤價計算報酬
+        Args:
+            index: 回測資料的日期索引
+            close: 收盤價
+            entries / exits: 進出場位置，未平倉為 OPEN
+            reasons: 出場原因代碼（陣列或單一代碼），預設 NO_REASON
+            stop_loss / take_profit: 與 close 對齊的價位，取進場K棒的值
+            keep_open: False 時略過未平倉的交易
+        """
+        entries = np.asarray(entries, dtype='int64')
+        exits = np.asarray(exits, dtype='int64')
+        reasons = np.broadcast_to(np.asarray(NO_REASON if reasons is None else reasons, dtype='int8'),
+                                  entries.shape)
+        if not keep_open:
+            closed = exits != kernels.OPEN
+            entries, exits, reasons = entries[closed], exits[closed], reasons[closed]
+
+        close = np.asarray(close, dtype='float64')
+        closed = exits != kernels.OPEN
+        records = np.empty(len(entries), dtype=DTYPE)
+        records['entry_index'] = entries
+        records['exit_index'] = exits
+        records['entry_price'] = close[entries]
+        records['exit_price'] = np.where(closed, close[np.where(closed, exits, 0)], np.nan)
+        records['return'] = (records['exit_price'] - records['entry_price']) / records['entry_price']
+        records['reason'] = reasons
+        levels = []
+        for name, values in (('stop_loss', stop_loss), ('take_profit', take_profit)):
+            if values is None:
+                records[name] = np.nan
+            else:
+                records[name] = np.asarray(values, dtype='float64')[entries]
+                levels.append(name)
+        return cls(records, index, levels)
+
+    @classmethod
+    def from_records(cls, trades: list, index: pd.Index) -> 'TradeTable':
+        """由舊格式的 list of dict 建立（日期須在 index 中），沒有 exit_date 或為 None 者視為未平倉"""
+        records = np.empty(len(trades), dtype=DTYPE)
+        levels = set()
+        reasons = list(REASONS)
+        for k, trade in enumerate(trades):
+            exit_date = trade.get('exit_date')
+            row = {
+                'entry_index': index.get_loc(trade['entry_date']),
+                'exit_index': kernels.OPEN if exit_date is None else index.get_loc(exit_date),
+                'entry_price': trade['entry_price'],
+                'exit_price': trade.get('exit_price', np.nan),
+                'return': trade.get('return', np.nan),
+                'reason': reason_code(trade.get('exit_reason'), reasons),
+            }
+            for name in LEVELS:
+                row[name] = trade.get(name, np.nan)
+                if name in trade:
+                    levels.add(name)
+            records[k] = tuple(np.nan if row[name] is None else row[name] for name in DTYPE.names)
+        return cls(records, index, levels, reasons)
+
+    @classmethod
+    def concat(cls, tables: list, index: pd.Index) -> 'TradeTable':
+        """合併多個交易紀錄（各自的位置換算到 index，出場原因代碼換算到合併後的代碼表）"""
+        tables = [table.reindex(index) for table in tables]
+        reasons = list(REASONS)
+        parts = []
+        for table in tables:
+            codes = [reason_code(name, reasons) for name in table.reasons]
+            records = table.records
+            if codes != list(range(len(codes))):
+                # 代碼表不同：依名稱換算代碼（NO_REASON 取到最後一個元素，維持不變）
+                records = records.copy()
+                records['reason'] = np.array(codes + [NO_REASON], dtype='int8')[records['reason']]
+            parts.append(records)
+        records = np.concatenate(parts) if parts else np.empty(0, DTYPE)
+        return cls(records, index, {name for table in tables for name in table.levels}, reasons)
+
+    def reindex(self, index: pd.Index) -> 'TradeTable':
+        """將進出場位置換算到另一個日期索引（例如由回測視窗換到完整歷史）"""
+        if index is self.index:
+            return self
+        if index.equals(self.index):
+            return TradeTable(self.records, index, self.levels, self.reasons)
+        records = self.records.copy()
+        records['entry_index'] = index.get_indexer(self.entry_dates)
+        closed = self.closed
+        records['exit_index'][closed] = index.get_indexer(self.exit_dates[closed])
+        if (records['entry_index'] < 0).any() or (records['exit_index'][closed] < 0).any():
+            raise ValueError("交易日期不在指定的日期索引中")
+        return TradeTable(records, index, self.levels, self.reasons)
+
+    def mark_open(self, price: float):
+        """以現價計算未平倉交易的出場價與報酬（出場日期仍為 None）"""
+        open_rows = ~self.closed
+        entry_price = self.records['entry_price'][open_rows]
+        self.records['exit_price'][open_rows] = price
+        self.records['return'][open_rows] = (price - entry_price) / entry_price
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        for k in range(len(self.records)):
+            yield self._row(k)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.records[key]
+        if isinstance(key, (int, np.integer)):
+            return self._row(int(key) + len(self.records) if key < 0 else int(key))
+        return TradeTable(self.records[key], self.index, self.levels, self.reasons)
+
+    def __repr__(self) -> str:
+        return f"TradeTable({len(self)} 筆交易)"
+
+    def _row(self, k: int) -> dict:
+        """第 k 筆交易的 dict，鍵值與舊版回測產生的 dict 相同"""
+        record = self.records[k]
+        trade = {'entry_date': self.index[record['entry_index']], 'entry_price': record['entry_price']}
+        for name in self.levels:
+            trade[name] = record[name]
+        is_open = record['exit_index'] == kernels.OPEN
+        if not is_open or record['reason'] != NO_REASON:
+            trade['exit_date'] = None if is_open else self.index[record['exit_index']]
+            trade['exit_price'] = record['exit_price']
+        if record['reason'] != NO_REASON:
+            trade['exit_reason'] = self.reasons[record['reason']]
+        if not np.isnan(record['return']):
+            trade['return'] = record['return']
+        return trade
+
+    @property
+    def closed(self) -> np.ndarray:
+        """已平倉交易的布林遮罩"""
+        return self.records['exit_index'] != kernels.OPEN
+
+    @property
+    def entry_dates(self) -> pd.Index:
+        return self.index[self.records['entry_index']]
+
+    @property
+    def exit_dates(self) -> pd.Index:
+        """出場日期，未平倉為 NaT"""
+        dates = self.index[np.where(self.closed, self.records['exit_index'], 0)]
+        return dates.where(self.closed)
+
+    @property
+    def returns(self) -> np.ndarray:
+        """有報酬的交易（已平倉或以現價計算的持倉中交易）的報酬率"""
+        values = self.records['return']
+        return values[~np.isnan(values)]
+
+    @property
+    def nbytes(self) -> int:
+        return self.records.nbytes
+
+    def win_rate(self) -> float:
+        """報酬大於 0 的交易占全部交易的比例"""
+        if len(self) == 0:
+            return 0
+        return int(np.count_nonzero(self.records['return'] > 0)) / len(self)
+
+    def reason_names(self, default: str = None) -> np.ndarray:
+        """每筆交易的出場原因名稱，沒有出場原因者為 default"""
+        # NO_REASON（-1）取到最後一個元素 default
+        names = np.array(list(self.reasons) + [default], dtype=object)
+        return names[self.records['reason']]
+
+    def to_frame(self) -> pd.DataFrame:
+        """每筆交易一列的 DataFrame"""
+        frame = pd.DataFrame({
+            'entry_date': self.entry_dates,
+            'entry_price': self.records['entry_price'],
+            'exit_date': self.exit_dates,
+            'exit_price': self.records['exit_price'],
+            'exit_reason': self.reason_names(),
+            'return': self.records['return'],
+        })
+        for name in self.levels:
+            frame[name] = self.records[name]
+        return frame
+
+    def to_list(self) -> list:
+        """轉為 list of dict"""
+        return list(self)
+
+
+def as_trade_table(trades, index: pd.Index) -> TradeTable:
+    """將交易紀錄（TradeTable 或 list of dict）轉為以 index 定位的 TradeTable"""
+    if isinstance(trades, TradeTable):
+        return trades.reindex(index)
+    return TradeTable.from_records(trades, index)
+
+
+def trade_returns(trades) -> np.ndarray:
+    """交易紀錄（TradeTable 或 list of dict）中有報酬的交易的報酬率"""
+    if isinstance(trades, TradeTable):
+        return trades.returns
+    return np.array([trade['return'] for trade in trades if trade.get('return') is not None], dtype='float64')
@@ -0,0 +1,93 @@
+"""
+批次指標（*_multi、rolling_mean_multi）與 pandas 逐一計算的等價性檢查，含缺值的輸入
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from strategies import indicators, kernels
+
+# 批次計算與 pandas 只差在累加捨入
+RTOL = 1e-9
+ATOL = 1e-9
+
+
+def _ohlcv(seed: int, n: int = 400, gaps: int = 0) -> pd.DataFrame:
+    """隨機漫步的 OHLCV；gaps 為收盤價缺值的K棒數"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.standard_normal(n))
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    if gaps:
+        close[rng.choice(np.arange(1, n), gaps, replace=False)] = np.nan
+    index = pd.bdate_range('2020-01-01', periods=n, name='Date')
+    return pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close,
+                         'Volume': rng.integers(1000, 5000, n)}, index=index)
+
+
+def _assert_columns(result, expected_columns):
+    for j, expected in enumerate(expected_columns):
+        np.testing.assert_allclose(result[:, j], expected.to_numpy(), rtol=RTOL, atol=ATOL, equal_nan=True)
+
+
+@pytest.mark.parametrize('gaps', [0, 1, 10])
+def test_rolling_mean_multi_matches_pandas(gaps):
+    rng = np.random.default_rng(gaps)
+    values = 100 + np.cumsum(rng.standard_normal(500))
+    values[200:230] = values[199]  # 常數區段
+    if gaps:
+        values[rng.choice(500, gaps, replace=False)] = np.nan
+    windows = [1, 2, 5, 20, 60, 600]
+    series = pd.Series(values)
+    _assert_columns(kernels.rolling_mean_multi(values, windows),
+                    [series.rolling(w).mean() for w in windows])
+
+
+def test_rolling_mean_multi_two_dimensional():
+    rng = np.random.default_rng(3)
+    values = rng.standard_normal((300, 3))
+    values[rng.random(values.shape) < 0.02] = np.nan
+    windows = [3, 10, 30]
+    _assert_columns(kernels.rolling_mean_multi(values, windows),
+                    [pd.Series(values[:, j]).rolling(w).mean() for j, w in enumerate(windows)])
+
+
+@pytest.mark.parametrize('gaps', [0, 10])
+def test_sma_multi_matches_pandas(gaps):
+    df = _ohlcv(1, gaps=gaps)
+    windows = [5, 20, 60]
+    _assert_columns(indicators.sma_multi(df, windows), [df['Close'].rolling(w).mean() for w in windows])
+
+
+@pytest.mark.parametrize('method', ['sma', 'ema'])
+@pytest.mark.parametrize('gaps', [0, 10])
+def test_atr_multi_matches_pandas(method, gaps):
+    df = _ohlcv(2, gaps=gaps)
+    periods = [7, 14, 20]
+    prev_close = df['Close'].shift()
+    tr = pd.concat([df['High'] - df['Low'], (df['High'] - prev_close).abs(), (df['Low'] - prev_close).abs()],
+                   axis=1).max(axis=1)
+    if method == 'sma':
+        expected = [tr.rolling(p).mean() for p in periods]
+    else:
+        expected = [tr.ewm(span=p, adjust=False).mean() for p in periods]
+    _assert_columns(indicators.atr_multi(df, periods, method), expected)
+
+
+@pytest.mark.parametrize('gaps', [0, 10])
+def test_rsi_multi_matches_pandas(gaps):
+    df = _ohlcv(4, gaps=gaps)
+    periods = [6, 14, 28]
+    delta = df['Close'].diff()
+    expected = []
+    for p in periods:
+        gain = delta.where(delta > 0, 0).rolling(p).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(p).mean()
+        expected.append(100 - (100 / (1 + gain / loss)))
+    _assert_columns(indicators.rsi_multi(df, periods), expected)
+
+
+def test_multi_results_fill_single_parameter_cache():
+    df = _ohlcv(5)
+    indicators.sma_multi(df, [10, 30])
+    pd.testing.assert_series_equal(indicators.sma(df, 10), df['Close'].rolling(10).mean(),
+                                   check_names=False, rtol=RTOL, atol=ATOL)
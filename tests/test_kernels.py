@@ -0,0 +1,158 @@
+"""
+向量化與 JIT 核心和參考實作（pandas 或逐根迴圈）的等價性檢查
+JIT 迴圈以未編譯的 Python 函式執行（語意與 numba 編譯結果相同）；有安裝 numba 時另外檢查編譯後的版本
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from strategies import jit, kernels
+
+
+def _backends():
+    backends = ['numpy', 'python']
+    if jit.available():
+        backends.append('numba')
+    return backends
+
+
+@pytest.fixture(params=_backends())
+def backend(request, monkeypatch):
+    """numpy：不使用 JIT；python：JIT 迴圈以 Python 執行；numba：編譯後的迴圈"""
+    if request.param == 'numpy':
+        monkeypatch.setattr(jit, 'get_kernel', lambda name: None)
+    elif request.param == 'python':
+        monkeypatch.setattr(jit, 'get_kernel', lambda name: jit._LOOPS[name])
+    else:
+        monkeypatch.setattr(jit, '_backend', 'numba')
+    return request.param
+
+
+def _random_walk(rng, n, gaps=0):
+    values = 100 + np.cumsum(rng.standard_normal(n))
+    if gaps:
+        values[rng.choice(np.arange(1, n), gaps, replace=False)] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('gaps', [0, 1, 5])
+def test_ewm_mean_multi_matches_pandas(backend, gaps):
+    rng = np.random.default_rng(gaps)
+    values = _random_walk(rng, 500, gaps)
+    coms = np.array([0.5, 1.0, 6.5, 13.0])
+    result = kernels.ewm_mean_multi(values, coms)
+    for j, com in enumerate(coms):
+        expected = pd.Series(values).ewm(com=com, adjust=False).mean().to_numpy()
+        np.testing.assert_array_equal(result[:, j], expected)
+
+
+def test_ewm_mean_multi_gap_regression(backend):
+    result = kernels.ewm_mean_multi(np.array([1.0, 2.0, np.nan, 4.0, 5.0]), [1.0])[:, 0]
+    expected = pd.Series([1.0, 2.0, np.nan, 4.0, 5.0]).ewm(com=1.0, adjust=False).mean().to_numpy()
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_ewm_mean_multi_leading_nan(backend):
+    values = np.concatenate(([np.nan] * 3, _random_walk(np.random.default_rng(7), 100)))
+    result = kernels.ewm_mean_multi(values, [2.0])[:, 0]
+    expected = pd.Series(values).ewm(com=2.0, adjust=False).mean().to_numpy()
+    np.testing.assert_array_equal(result, expected)
+
+
+def _signal_trades_reference(signal):
+    """逐根狀態機：空手時遇到 1 進場，持倉時遇到 -1 出場，最後未平倉的進場不計入"""
+    entries, exits = [], []
+    holding = False
+    for i, value in enumerate(signal):
+        if not holding and value == 1:
+            entries.append(i)
+            holding = True
+        elif holding and value == -1:
+            exits.append(i)
+            holding = False
+    return entries[:len(exits)], exits
+
+
+@pytest.mark.parametrize('dtype', ['int64', 'int8', 'float64'])
+def test_signal_trades_matches_reference(dtype):
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        signal = rng.choice([-1, 0, 0, 0, 1], 300).astype(dtype)
+        if dtype == 'float64':
+            signal[rng.choice(300, 10, replace=False)] = np.nan
+        entries, exits = kernels.signal_trades(signal)
+        expected_entries, expected_exits = _signal_trades_reference(signal)
+        np.testing.assert_array_equal(entries, expected_entries)
+        np.testing.assert_array_equal(exits, expected_exits)
+
+
+def _exit_reference(signal, close, times, stop_loss, take_profit, trailing, max_hold, start):
+    """以 jit 的逐根迴圈（未編譯）計算出場，作為 exit_trades 的參考結果"""
+    n = len(close)
+    levels = [np.full(n, np.nan) if values is None else np.asarray(values, dtype='float64')
+              for values in (stop_loss, take_profit, trailing)]
+    entries, exits, reasons = (np.empty(n, dtype='int64'), np.empty(n, dtype='int64'),
+                               np.empty(n, dtype='int8'))
+    count = jit._exit_loop(signal, close, times, *levels, 0 if max_hold is None else max_hold,
+                           max_hold is not None, start, entries, exits, reasons)
+    return entries[:count], exits[:count], reasons[:count]
+
+
+@pytest.mark.parametrize('gaps', [0, 5, 40])
+def test_exit_trades_matches_reference(backend, gaps):
+    rng = np.random.default_rng(gaps)
+    n = 400
+    times = np.cumsum(rng.integers(1, 4, n)).astype('int64')
+    for trial in range(10):
+        close = _random_walk(rng, n, gaps)
+        signal = (rng.random(n) < 0.05).astype('int8' if trial % 2 else 'int64')
+        signal[rng.random(n) < 0.05] = -1
+        stop_loss = close - rng.uniform(1, 4, n)
+        take_profit = close + rng.uniform(1, 6, n)
+        trailing = rng.uniform(1, 3, n)
+        for options in [
+            {},
+            {'stop_loss': stop_loss, 'take_profit': take_profit},
+            {'trailing': trailing, 'max_hold': 10},
+            {'stop_loss': stop_loss, 'take_profit': take_profit, 'trailing': trailing, 'max_hold': 7},
+        ]:
+            start = int(rng.integers(0, 20))
+            result = kernels.exit_trades(signal, close, times, start=start, **options)
+            expected = _exit_reference(signal, close, times, options.get('stop_loss'), options.get('take_profit'),
+                                       options.get('trailing'), options.get('max_hold'), start)
+            for values, reference in zip(result, expected):
+                np.testing.assert_array_equal(values, reference)
+
+
+def test_exit_trades_trailing_skips_missing_close(backend):
+    close = np.array([10.0, 11.0, np.nan, 12.0, 8.0, 7.0])
+    entries, exits, reasons = kernels.exit_trades(np.array([1, 0, 0, 0, 0, 0]), close, trailing=np.full(6, 2.0))
+    np.testing.assert_array_equal(exits, [4])
+    np.testing.assert_array_equal(reasons, [kernels.TRAILING_STOP])
+
+
+def test_first_entry_matches_reference(backend):
+    rng = np.random.default_rng(5)
+    for dtype in ('int64', 'int8'):
+        for density in (0.0, 0.01, 0.2):
+            signal = (rng.random(200) < density).astype(dtype)
+            assert kernels.first_entry(signal) == jit._first_entry_loop(signal)
+
+
+@pytest.mark.parametrize('gaps', [0, 5])
+def test_supertrend_matches_reference(backend, gaps):
+    rng = np.random.default_rng(gaps + 1)
+    n = 300
+    close = _random_walk(rng, n, gaps)
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    atr = pd.Series(high - low).rolling(10).mean().to_numpy()
+    for multiplier in (1.0, 3.0):
+        result = kernels.supertrend(high, low, close, atr, multiplier)
+        hl2 = (high + low) / 2.0
+        upper = hl2 + multiplier * atr
+        lower = hl2 - multiplier * atr
+        trend = np.ones(n, dtype=bool)
+        values = np.full(n, np.nan)
+        jit._supertrend_loop(close, upper, lower, trend, values)
+        for actual, expected in zip(result, (values, trend, upper, lower)):
+            np.testing.assert_array_equal(actual, expected)
@@ -0,0 +1,32 @@
+"""
+穩健性分析的路徑績效與 metrics.compute 一致，區塊 bootstrap 的合併結果與展開成逐日路徑後計算相同
+"""
+import importlib
+import math
+import numpy as np
+from strategies import metrics
+
+robustness = importlib.import_module('analysis.robustness')
+
+
+def test_path_metrics_matches_compute():
+    paths = np.random.default_rng(0).normal(0, 0.02, (20, 60))
+    paths[:, 0] = -0.05  # 第一根就虧損，回撤須從起始資金算起
+    result = robustness.path_metrics(paths)
+    expected = metrics.compute(paths)
+    for name in robustness.PATH_METRICS:
+        np.testing.assert_array_equal(result[name], expected[name])
+
+
+def test_block_bootstrap_matches_expanded_paths():
+    daily = np.random.default_rng(1).normal(0, 0.02, 300)
+    daily[:5] = -0.03
+    n, block_size, n_paths = len(daily), 20, 50
+    for seed in range(3):
+        result = robustness.block_bootstrap(daily, n_paths, block_size, seed)
+        starts = np.random.default_rng(seed).integers(0, n, (n_paths, math.ceil(n / block_size)))
+        paths = np.stack([np.concatenate([daily[(start + np.arange(block_size)) % n] for start in row])[:n]
+                          for row in starts])
+        expected = robustness.path_metrics(paths)
+        for name in robustness.PATH_METRICS:
+            np.testing.assert_allclose(result[name].to_numpy(), expected[name], rtol=1e-9, atol=1e-12)
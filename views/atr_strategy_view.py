@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from strategies.trade_table import as_trade_table
 
 
 class ATRStrategyView:
@@ -73,7 +74,11 @@ class ATRStrategyView:
         self.result_text.insert(tk.END, "=== 回測結果 ===\n")
         self.result_text.insert(tk.END, f"總報酬率: {results['total_return']:.2%}\n")
         self.result_text.insert(tk.END, f"夏普比率: {results['sharpe_ratio']:.2f}\n")
-        self.result_text.insert(tk.END, f"最大回撤: {results['max_drawdown']:.2%}\n")
+        self.result_text.insert(tk.END, f"索提諾比率: {results['sortino_ratio']:.2f}\n")
+        self.result_text.insert(tk.END, f"卡瑪比率: {results['calmar_ratio']:.2f}\n")
+        self.result_text.insert(tk.END, f"最大回撤: {results['max_drawdown']:.2%}"
+                                        f"（{results['max_drawdown_duration']} 根K棒）\n")
+        self.result_text.insert(tk.END, f"曝險比例: {results['exposure']:.2%}\n")
         self.result_text.insert(tk.END, f"勝率: {results['win_rate']:.2%}\n")
         self.result_text.insert(tk.END, f"交易次數: {results['num_trades']}\n")
 
@@ -83,15 +88,11 @@ class ATRStrategyView:
         # 價格走勢
         self.ax.plot(data.index, data['Close'], label='收盤價')
 
-        # 交易點
-        for trade in trades:
-            entry_date = trade['entry_date']
-            exit_date = trade['exit_date']
-            entry_price = trade['entry_price']
-            exit_price = trade['exit_price']
-
-            self.ax.scatter(entry_date, entry_price, color='g', marker='^')
-            self.ax.scatter(exit_date, exit_price, color='r', marker='v')
+        # 交易點（整欄一次繪製，未平倉的交易只標示進場點）
+        trades = as_trade_table(trades, data.index)
+        closed = trades.closed
+        self.ax.scatter(trades.entry_dates, trades['entry_price'], color='g', marker='^')
+        self.ax.scatter(trades.exit_dates[closed], trades['exit_price'][closed], color='r', marker='v')
 
         self.ax.set_title('價格走勢與交易點')
         self.ax.set_xlabel('日期')